@@ -0,0 +1,65 @@
+import argparse
+
+import ujson
+
+from . import common
+
+SUITES = (
+    "collision",
+    "map_io",
+    "serialization",
+    "server",
+    "frame",
+    "startup",
+    "alloc",
+    "sprites",
+    "particles",
+    "zoom",
+    "lighting",
+    "map_sync",
+    "navigation",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Run the Hell 2D benchmarks"
+    )
+    parser.add_argument(
+        "suites",
+        nargs="*",
+        help=f"suites to run out of {', '.join(SUITES)}. All of them when omitted",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="PATH",
+        default="bench_output.json",
+        help="where to write the results (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    for suite in args.suites:
+        if suite not in SUITES:
+            parser.error(f"Unknown suite `{suite}`")
+
+    common.setup_headless()
+    results = []
+    for suite in args.suites or SUITES:
+        module = __import__(f"benchmarks.bench_{suite}", fromlist=["run"])
+        for result in module.run():
+            result["suite"] = suite
+            params = " ".join(f"{k}={v}" for k, v in result["params"].items())
+            if "best" in result:
+                value = f"{result['best'] * 1e6:>12.1f} us"
+            else:
+                value = f"{result['peak_bytes']:>12} B peak"
+            print(f"{result['name']:<32} {params:<16} {value}")
+            results.append(result)
+
+    with open(args.output, "w") as f:
+        ujson.dump(
+            {"environment": common.get_environment(), "results": results}, f, indent=2
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import pygame
+import ujson
+
+from src import shared, utils
+from src.player import OtherClientHandler
+from src.replay import ReplayClient
+
+from .common import measure_allocations
+
+N_COLLIDERS = 200
+N_PEERS = 16
+
+
+def make_snapshot(seq: int) -> bytes:
+    clients = [
+        {
+            "id": i,
+            "pos": [i * 60.0 + seq % 7, 300.0],
+            "size": [28, 84],
+            "character_data": '{"name":"bot","hair":"default_hair",'
+            '"face":"default_face","outfit":"default_outfit"}',
+        }
+        for i in range(N_PEERS)
+    ]
+    return ujson.dumps({"seq": seq, "echo": None, "clients": clients}).encode()
+
+
+def run() -> list[dict]:
+    results = []
+    utils.Collider.all_colliders.clear()
+    utils.Collider.temp_colliders.clear()
+    for i in range(N_COLLIDERS):
+        utils.Collider((i % 50 * 100, i // 50 * 60 + 100), (100, 30))
+
+    mover = utils.Collider((40, 40), (28, 84), temp=True)
+
+    def collide():
+        mover.pos.update(40, 40)
+        mover.get_collision_data(2, 30)
+
+    def draw_colliders():
+        for collider in utils.Collider.all_colliders:
+            collider.draw()
+
+    image = pygame.Surface((16, 16))
+    point = pygame.Vector2(300, 200)
+
+    def blit_transformed():
+        shared.screen.blit(image, shared.camera.transform(point))
+
+    # Peers move every frame, like they do in the lobby
+    shared.client = ReplayClient()
+    handler = OtherClientHandler()
+    snapshots = [make_snapshot(seq) for seq in range(60)]
+    frame = 0
+
+    def receive_snapshot():
+        nonlocal frame
+        shared.client.feed(snapshots[frame % len(snapshots)])
+        frame += 1
+        utils.Collider.temp_colliders.clear()
+
+    for name, params, fn, setup in (
+        ("collider.get_collision_data", {"colliders": N_COLLIDERS}, collide, None),
+        ("collider.draw", {"colliders": N_COLLIDERS}, draw_colliders, None),
+        ("camera.transform", {}, blit_transformed, None),
+        ("other_clients.update", {"peers": N_PEERS}, handler.update, receive_snapshot),
+    ):
+        results.append(
+            {"name": name, "params": params, **measure_allocations(fn, setup)}
+        )
+
+    utils.Collider.all_colliders.clear()
+    utils.Collider.temp_colliders.clear()
+    return results
@@ -0,0 +1,53 @@
+from src import utils
+
+from .common import measure
+
+COLLIDER_COUNTS = (10, 100, 1000)
+
+
+def run() -> list[dict]:
+    results = []
+    for n_colliders in COLLIDER_COUNTS:
+        utils.Collider.all_colliders.clear()
+        utils.Collider.temp_colliders.clear()
+        for i in range(n_colliders):
+            utils.Collider((i % 50 * 100, i // 50 * 60 + 100), (100, 30))
+
+        mover = utils.Collider((40, 40), (28, 84), temp=True)
+
+        def reset():
+            mover.pos.update(40, 40)
+
+        results.append(
+            {
+                "name": "collider.get_collision_data",
+                "params": {"colliders": n_colliders},
+                **measure(lambda: mover.get_collision_data(2, 30), setup=reset),
+            }
+        )
+
+        # Standing on the first floor, what an idle player checks instead
+        resting = utils.Collider((40, 16), (28, 84), temp=True)
+        resting.sleep_on(utils.Collider.all_colliders[0])
+        results.append(
+            {
+                "name": "collider.can_keep_sleeping",
+                "params": {"colliders": n_colliders},
+                **measure(resting.can_keep_sleeping),
+            }
+        )
+
+        world = utils.Collider.world
+        world.invalidate()
+        world.sync()
+        # Diagonally down through the rows, like a shot fired across the map
+        results.append(
+            {
+                "name": "collision_world.raycast",
+                "params": {"colliders": n_colliders},
+                **measure(lambda: world.raycast((0, 0), (1, 0.3), 3000)),
+            }
+        )
+
+    utils.Collider.all_colliders.clear()
+    return results
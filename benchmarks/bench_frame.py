@@ -0,0 +1,38 @@
+import os
+
+import pygame
+
+from src import shared, utils
+from src.game_state import GameState
+
+from .bench_map_io import ENTITIES
+from .common import measure, write_synthetic_map
+
+MAP_SIZES = (100, 1000, 5000)
+
+
+def run() -> list[dict]:
+    results = []
+    for n_entities in MAP_SIZES:
+        path = write_synthetic_map(n_entities)
+        try:
+            shared.world_map = utils.WorldMap(path, ENTITIES)
+            state = GameState()
+
+            def frame():
+                shared.screen.fill((20, 20, 20))
+                state.update()
+                state.draw()
+                pygame.display.flip()
+
+            results.append(
+                {
+                    "name": "game_state.frame",
+                    "params": {"entities": n_entities},
+                    **measure(frame),
+                }
+            )
+        finally:
+            utils.Collider.all_colliders.clear()
+            os.remove(path)
+    return results
@@ -0,0 +1,53 @@
+import random
+
+from src import shared, utils
+
+from .common import measure
+
+LIGHT_COUNTS = (16, 256, 2048)
+# The lights are spread over a square this wide, centred on the view
+AREA_SIZE = 2048
+
+
+def run() -> list[dict]:
+    results = []
+    rng = random.Random(0)
+    shared.camera.offset.update(0, 0)
+    for n_lights in LIGHT_COUNTS:
+        lights = [
+            utils.Light(
+                (
+                    rng.uniform(-AREA_SIZE / 2, AREA_SIZE / 2) + shared.srect.centerx,
+                    rng.uniform(-AREA_SIZE / 2, AREA_SIZE / 2) + shared.srect.centery,
+                ),
+                rng.choice((80, 120, 200)),
+                rng.choice(("orange", "gold", "orangered")),
+            )
+            for _ in range(n_lights)
+        ]
+        params = {"lights": n_lights}
+
+        # Baked on the first call, the rest reuse the chunks
+        light_map = utils.LightMap(lights)
+        results.append(
+            {
+                "name": "light_map.draw_static",
+                "params": params,
+                **measure(light_map.draw),
+            }
+        )
+
+        # The same lights added one by one every frame
+        light_map = utils.LightMap([])
+        utils.Light.temp_lights[:] = lights
+        try:
+            results.append(
+                {
+                    "name": "light_map.draw_temp",
+                    "params": params,
+                    **measure(light_map.draw),
+                }
+            )
+        finally:
+            utils.Light.temp_lights.clear()
+    return results
@@ -0,0 +1,46 @@
+import os
+
+from src import utils
+from src.chests import Chest
+from src.floor import Floor, Rose, Sunflower
+from src.player import ClientSpawnPoint
+
+from .common import measure, write_synthetic_map
+
+MAP_SIZES = (100, 1000, 5000)
+ENTITIES = [Floor, ClientSpawnPoint, Rose, Sunflower, Chest]
+
+
+def run() -> list[dict]:
+    results = []
+    for n_entities in MAP_SIZES:
+        path = write_synthetic_map(n_entities)
+        try:
+            world_map = utils.WorldMap(path, ENTITIES)
+            params = {"entities": n_entities}
+
+            results.append(
+                {
+                    "name": "world_map.load_map_items",
+                    "params": params,
+                    **measure(world_map.load_map_items),
+                }
+            )
+            results.append(
+                {
+                    "name": "world_map.load",
+                    "params": params,
+                    **measure(world_map.load, setup=utils.Collider.all_colliders.clear),
+                }
+            )
+            results.append(
+                {
+                    "name": "world_map.dump",
+                    "params": params,
+                    **measure(world_map.dump),
+                }
+            )
+        finally:
+            utils.Collider.all_colliders.clear()
+            os.remove(path)
+    return results
@@ -0,0 +1,62 @@
+import os
+import time
+
+from src import utils
+
+from .common import measure, write_synthetic_map
+
+ENTITY_COUNTS = (1000, 5000)
+LOSSES = (0.0, 0.05)
+
+
+def run() -> list[dict]:
+    results = []
+    for n_entities in ENTITY_COUNTS:
+        path = write_synthetic_map(n_entities)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        finally:
+            os.remove(path)
+
+        server = utils.UDPServer(0, map_data=data)
+        server.start()
+        for loss in LOSSES:
+            conditioner = utils.NetworkConditioner(
+                server.socket.getsockname(),
+                utils.NetworkConditions(loss=loss),
+                seed=0,
+            )
+            conditioner.start()
+            client = utils.UDPClient(*conditioner.addr)
+            client.start()
+            while client.map_hash is None:
+                time.sleep(0.001)
+
+            def forget_map():
+                # As if joining for the first time, with nothing cached
+                with client.map_lock:
+                    client.map_data = None
+
+            def download():
+                client.download_map()
+                while client.map_data is None:
+                    time.sleep(0.0005)
+
+            try:
+                results.append(
+                    {
+                        "name": "map_sync.download",
+                        "params": {
+                            "entities": n_entities,
+                            "loss": loss,
+                            "chunks": len(server.map_chunks),
+                        },
+                        **measure(download, setup=forget_map, repeat=3),
+                    }
+                )
+            finally:
+                client.close()
+                conditioner.close()
+        server.close()
+    return results
@@ -0,0 +1,77 @@
+import itertools
+import random
+
+from src import utils
+from src.bots import BOT_BODY
+
+from .common import measure
+
+FLOOR_COUNTS = (100, 1000)
+# Paths looked up per tick, one for each bot picking a new target
+BOTS = 48
+
+
+def make_floors(n_floors: int, rng: random.Random) -> list[tuple]:
+    """Floors scattered over columns, about a quarter of each one filled"""
+
+    floors = set()
+    while len(floors) < n_floors:
+        columns = n_floors // 8
+        floors.add((rng.randrange(-columns, columns) * 100, rng.randrange(40) * 30))
+    return [(x, y, 100, 30) for x, y in floors]
+
+
+def run() -> list[dict]:
+    results = []
+    rng = random.Random(0)
+    for n_floors in FLOOR_COUNTS:
+        floors = make_floors(n_floors, rng)
+        params = {"floors": n_floors}
+        results.append(
+            {
+                "name": "nav_graph.build",
+                "params": params,
+                **measure(lambda: utils.NavGraph.build(floors, BOT_BODY), repeat=3),
+            }
+        )
+
+        nav_graph = utils.NavGraph.build(floors, BOT_BODY)
+        nodes = sorted(nav_graph.edges)
+        pairs = itertools.cycle(
+            [[(rng.choice(nodes), rng.choice(nodes)) for _ in range(BOTS)]]
+        )
+
+        def find_paths():
+            for start, goal in next(pairs):
+                nav_graph.find_path(start, goal)
+
+        results.append(
+            {
+                "name": "nav_graph.find_path_uncached",
+                "params": {**params, "bots": BOTS},
+                **measure(find_paths, setup=nav_graph.paths.clear),
+            }
+        )
+        results.append(
+            {
+                "name": "nav_graph.find_path_cached",
+                "params": {**params, "bots": BOTS},
+                **measure(find_paths),
+            }
+        )
+
+        # What the editor does when a floor is placed
+        x, y, w, h = rng.choice(floors)
+
+        def add_floor():
+            nav_graph.add_floor((x, y - h, w, h))
+
+        results.append(
+            {
+                "name": "nav_graph.add_floor",
+                "params": params,
+                **measure(add_floor),
+            }
+        )
+
+    return results
@@ -0,0 +1,43 @@
+from src import shared, utils
+
+from .common import measure
+
+PARTICLE_COUNTS = (1000, 10000, 50000)
+
+
+def run() -> list[dict]:
+    results = []
+    sprites = utils.make_glow_sprites(["gold", "orange", "orangered", "firebrick"])
+    for n_particles in PARTICLE_COUNTS:
+        particles = utils.ParticleSystem(
+            sprites, capacity=n_particles, gravity=(0, -40), drag=0.5
+        )
+        screen_area = (0, 0, *shared.srect.size)
+
+        def refill():
+            # Long lived, so nothing gets culled while measuring
+            particles.emit(
+                n_particles - len(particles),
+                screen_area,
+                speed=(20, 90),
+                angle=(0, 360),
+                life=(50, 60),
+                colors=(0, 1, 2, 3),
+            )
+
+        refill()
+        results.append(
+            {
+                "name": "particles.update",
+                "params": {"particles": n_particles},
+                **measure(lambda: particles.update(1 / 60), setup=refill),
+            }
+        )
+        results.append(
+            {
+                "name": "particles.draw",
+                "params": {"particles": n_particles},
+                **measure(particles.draw, setup=refill),
+            }
+        )
+    return results
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import ujson
+
+from src import shared, utils
+from src.player import CharacterData, OtherClientHandler, make_state_packet
+
+from .common import measure
+
+PLAYER_COUNTS = (1, 8, 32, 64)
+
+
+def make_character_data(i: int) -> CharacterData:
+    return CharacterData(
+        name=f"guest_{i}",
+        hair="default_hair",
+        face="default_face",
+        outfit="default_outfit",
+    )
+
+
+def make_snapshot(n_players: int) -> dict:
+    clients = []
+    for i in range(n_players):
+        state = make_state_packet((i * 37.5, 120.25), (28, 84), make_character_data(i))
+        state["id"] = i
+        clients.append(state)
+    return {"type": "snapshot", "seq": 1, "echo": 0.5, "clients": clients}
+
+
+def run() -> list[dict]:
+    results = []
+    packer = utils.PacketPacker()
+    reassembler = utils.Reassembler()
+    character_data = make_character_data(0)
+
+    def encode_state():
+        state = make_state_packet((120.5, 300.25), (28, 84), character_data)
+        state.update(type="state", seq=1, t=0.5)
+        packer.pack(ujson.dumps(state).encode())
+
+    results.append(
+        {"name": "player.encode_state", "params": {}, **measure(encode_state)}
+    )
+
+    for n_players in PLAYER_COUNTS:
+        params = {"players": n_players}
+        snapshot = make_snapshot(n_players)
+        datagrams = packer.pack(ujson.dumps(snapshot).encode())
+
+        results.append(
+            {
+                "name": "server.encode_snapshot",
+                "params": params,
+                **measure(lambda: packer.pack(ujson.dumps(snapshot).encode())),
+            }
+        )
+
+        def decode_snapshot():
+            for datagram in datagrams:
+                data = reassembler.add(datagram)
+            ujson.loads(data)
+
+        results.append(
+            {
+                "name": "client.decode_snapshot",
+                "params": params,
+                **measure(decode_snapshot),
+            }
+        )
+
+        handler = OtherClientHandler()
+        shared.client = SimpleNamespace(received_state=snapshot)  # type: ignore
+
+        def handle_snapshot():
+            handler.last_seq = None
+            utils.Collider.temp_colliders.clear()
+            handler.update()
+
+        results.append(
+            {
+                "name": "other_client_handler.update",
+                "params": params,
+                **measure(handle_snapshot),
+            }
+        )
+
+    utils.Collider.temp_colliders.clear()
+    return results
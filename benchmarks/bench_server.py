@@ -0,0 +1,71 @@
+import socket
+import time
+
+from src import utils
+from src.utils.server import Session
+
+from .bench_serialization import make_snapshot
+from .common import measure
+
+CLIENT_COUNTS = (2, 8, 32, 64)
+
+
+def run() -> list[dict]:
+    results = []
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    sink.setblocking(False)
+
+    for n_clients in CLIENT_COUNTS:
+        server = utils.UDPServer(0, capacity=n_clients)
+        states = make_snapshot(n_clients)["clients"]
+        for i, state in enumerate(states):
+            # Every session points at the sink, so sends stay on loopback
+            session = Session(i, sink.getsockname())
+            session.state = state
+            server.sessions[("bench", i)] = session
+            server.grid.insert(i, *state["pos"])
+
+        def drain():
+            try:
+                while True:
+                    sink.recv(65535)
+            except BlockingIOError:
+                pass
+
+        results.append(
+            {
+                "name": "udp_server.broadcast",
+                "params": {"clients": n_clients},
+                **measure(server.broadcast, setup=drain),
+            }
+        )
+
+        # A second of history for everyone, then a shot along the first row
+        start = time.perf_counter() - 1
+        for session in server.sessions.values():
+            for step in range(60):
+                session.state["pos"][0] += 1
+                session.record_position(start + step / 60)
+        shooter = server.sessions[("bench", 0)]
+        x, y, w, h = shooter.history.latest()  # type: ignore
+        shot = {
+            "origin": [x + w, y + h / 2],
+            "direction": [1, 0],
+            "range": 2000,
+        }
+        targets = [s for s in server.sessions.values() if s is not shooter]
+        view_time = start + 0.5
+        results.append(
+            {
+                "name": "udp_server.validate_hitscan",
+                "params": {"clients": n_clients},
+                **measure(
+                    lambda: server.get_hitscan_hits(shooter, shot, targets, view_time)
+                ),
+            }
+        )
+        server.socket.close()
+
+    sink.close()
+    return results
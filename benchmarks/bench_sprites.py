@@ -0,0 +1,39 @@
+import pygame
+
+from src import shared
+from src.player import OutfitManager
+
+from .common import measure
+
+PLAYER_COUNTS = (1, 16, 32)
+ANGLES = (-20.0, -10.0, 0.0, 10.0, 20.0)
+
+
+def run() -> list[dict]:
+    results = []
+    outfit = OutfitManager(scale=0.4)
+    rect = pygame.FRect((300, 200), outfit.image.get_size())
+
+    for n_players in PLAYER_COUNTS:
+        poses = [(ANGLES[i % len(ANGLES)], bool(i % 2)) for i in range(n_players)]
+
+        def draw_uncached():
+            for angle, flip_x in poses:
+                image = pygame.transform.flip(outfit.image, flip_x, False)
+                image = pygame.transform.rotate(image, angle)
+                shared.screen.blit(image, shared.camera.transform(rect))
+
+        def draw_cached():
+            for angle, flip_x in poses:
+                outfit.draw(rect, angle, flip_x)
+
+        OutfitManager.transform_cache.clear()
+        for name, fn in (
+            ("outfit.draw_transformed", draw_uncached),
+            ("outfit.draw_cached", draw_cached),
+        ):
+            results.append(
+                {"name": name, "params": {"players": n_players}, **measure(fn)}
+            )
+
+    return results
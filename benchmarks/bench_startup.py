@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import time
+
+RUNS = 5
+
+FIRST_FRAME_SCRIPT = """
+import time
+start = time.perf_counter()
+from src.core import Core
+core = Core()
+core.update()
+core.draw()
+print(time.perf_counter() - start)
+"""
+
+
+def run() -> list[dict]:
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    in_process = []
+    wall_clock = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", FIRST_FRAME_SCRIPT],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=env,
+        ).stdout
+        wall_clock.append(time.perf_counter() - start)
+        in_process.append(float(output.strip().splitlines()[-1]))
+
+    return [
+        {
+            "name": "startup.time_to_first_frame",
+            "params": {"measured": "in process"},
+            "calls": RUNS,
+            "best": min(in_process),
+            "mean": sum(in_process) / RUNS,
+        },
+        {
+            "name": "startup.time_to_first_frame",
+            "params": {"measured": "wall clock"},
+            "calls": RUNS,
+            "best": min(wall_clock),
+            "mean": sum(wall_clock) / RUNS,
+        },
+    ]
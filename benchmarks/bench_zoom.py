@@ -0,0 +1,45 @@
+import os
+
+from src import shared, utils
+
+from .bench_map_io import ENTITIES
+from .common import measure, write_synthetic_map
+
+N_ENTITIES = 5000
+ZOOMS = (1.0, 0.5, 0.125)
+
+
+def run() -> list[dict]:
+    results = []
+    path = write_synthetic_map(N_ENTITIES)
+    try:
+        world_map = utils.WorldMap(path, ENTITIES)
+        camera = shared.camera
+        for zoom in ZOOMS:
+            camera.zoom = zoom
+            camera.offset.update(0, 0)
+            params = {"entities": N_ENTITIES, "zoom": zoom}
+
+            def draw_items():
+                for item in world_map.entities:
+                    item.draw()
+
+            results.append(
+                {
+                    "name": "world_map.draw_items",
+                    "params": params,
+                    **measure(draw_items),
+                }
+            )
+            # Baked on the first call, the rest reuse the chunks
+            results.append(
+                {
+                    "name": "world_map.draw_chunks",
+                    "params": params,
+                    **measure(world_map.draw),
+                }
+            )
+    finally:
+        shared.camera.zoom = 1.0
+        os.remove(path)
+    return results
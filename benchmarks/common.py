@@ -0,0 +1,152 @@
+import gc
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import typing as t
+from pathlib import Path
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import ujson
+
+from src import shared, utils
+
+
+def setup_headless():
+    """Gives `shared` everything the game code expects, without a real window"""
+
+    pygame.init()
+    shared.screen = pygame.display.set_mode((1100, 650))
+    shared.srect = shared.screen.get_rect()
+    shared.clock = pygame.Clock()
+    shared.camera = utils.Camera()
+    shared.scheduler = utils.Scheduler()
+    shared.quality = utils.QualityController()
+    shared.events = []
+    shared.dt = 1 / 60
+    shared.keys = pygame.key.get_pressed()
+    shared.kp = pygame.key.get_just_pressed()
+    shared.kr = pygame.key.get_just_released()
+    shared.mouse_pos = pygame.Vector2()
+    shared.mouse_press = (False, False, False)
+    shared.mjp = (False,) * 5
+    shared.mjr = (False,) * 5
+
+
+def measure(
+    fn: t.Callable[[], object],
+    setup: t.Callable[[], object] | None = None,
+    min_time: float = 0.2,
+    repeat: int = 5,
+) -> dict:
+    """
+    Times `fn` in batches that run for at least `min_time` seconds each and
+    returns the best and mean time per call over `repeat` batches.
+    `setup` runs before every call and is not timed.
+    """
+
+    # Work out how many calls make up a batch
+    number = 1
+    while True:
+        elapsed = _time_batch(fn, setup, number)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    per_call = [_time_batch(fn, setup, number) / number for _ in range(repeat)]
+    return {
+        "calls": number,
+        "best": min(per_call),
+        "mean": sum(per_call) / len(per_call),
+    }
+
+
+def _time_batch(fn, setup, number: int) -> float:
+    elapsed = 0.0
+    for _ in range(number):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def measure_allocations(
+    fn: t.Callable[[], object],
+    setup: t.Callable[[], object] | None = None,
+    calls: int = 1000,
+) -> dict:
+    """
+    Runs `fn` under tracemalloc and reports, per call, the peak of memory
+    allocated on top of what was live before it, and what it left behind.
+    Also counts the young generation collections the calls triggered.
+    `setup` runs before every call and is not counted.
+    """
+
+    # Warm caches up so one-off allocations don't count
+    if setup is not None:
+        setup()
+    fn()
+
+    peaks = [0] * calls
+    retained = 0
+    gc_before = gc.get_stats()[0]["collections"]
+    tracemalloc.start()
+    try:
+        for i in range(calls):
+            if setup is not None:
+                setup()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            after, peak = tracemalloc.get_traced_memory()
+            peaks[i] = peak - before
+            retained += after - before
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "calls": calls,
+        "peak_bytes": max(peaks),
+        "mean_peak_bytes": sum(peaks) / calls,
+        "retained_bytes": retained / calls,
+        "gen0_collections": gc.get_stats()[0]["collections"] - gc_before,
+    }
+
+
+def write_synthetic_map(n_entities: int, entity_name: str = "Floor") -> Path:
+    """Writes a map of `n_entities` tiles laid out in rows and returns its path"""
+
+    row_length = 50
+    schema = [
+        [entity_name, [(i % row_length) * 100.0, (i // row_length) * 60.0]]
+        for i in range(n_entities)
+    ]
+    fd, path = tempfile.mkstemp(suffix=".json", prefix="hell2d_bench_")
+    with os.fdopen(fd, "w") as f:
+        ujson.dump(schema, f, indent=2)
+    return Path(path)
+
+
+def get_environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "time": time.time(),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
@@ -0,0 +1,288 @@
+import argparse
+import random
+import socket
+import threading
+import time
+
+import pygame
+import ujson
+
+from src import shared, utils
+from src.player import CharacterData, Player, make_state_packet
+
+# Bots move faster than players, but go where a player could
+BOT_BODY = Player.NAV_BODY
+BOT_SIZE = BOT_BODY.size
+
+
+def load_nav_graph(map_path: str) -> utils.NavGraph:
+    """
+    Where bots can go on the map. Shares its cache beside the map file with
+    `WorldMap.get_nav_graph`, which the lobby editor keeps up to date.
+    """
+
+    floor_size = pygame.image.load(utils.get_asset_path("assets/floor.png")).get_size()
+    with open(map_path, "rb") as f:
+        raw = f.read()
+
+    floors = [
+        tuple(pygame.Rect((x, y), floor_size))
+        for class_name, (x, y) in ujson.loads(raw)
+        if class_name == "Floor"
+    ]
+    return utils.NavGraph.load_or_build(
+        floors,  # type: ignore
+        BOT_BODY,
+        utils.get_nav_cache_path(map_path),
+        utils.hash_map(raw),
+    )
+
+
+class Bot:
+    """Headless client that runs between floors and sends player state packets"""
+
+    def __init__(
+        self,
+        bot_id: int,
+        server_addr: tuple[str, int],
+        nav_graph: utils.NavGraph,
+        path_mode: str = "random",
+        speed: float = Player.MAX_HORIZONTAL_SPEED * 4,
+    ) -> None:
+        self.nav_graph = nav_graph
+        # Floors in order from left to right, for patrolling
+        self.nodes = sorted(nav_graph.edges)
+        self.path_mode = path_mode
+        self.speed = speed
+        self.character_data = CharacterData(
+            name=f"bot_{bot_id}",
+            hair="default_hair",
+            face="default_face",
+            outfit="default_outfit",
+        )
+        self.client = utils.UDPClient(*server_addr)
+
+        self.node_index = random.randrange(len(self.nodes))
+        self.direction = 1
+        x, y, w, _ = self.nodes[self.node_index]
+        self.feet = pygame.Vector2(random.uniform(x, x + w), y)
+        # Where the feet go next, along the path to the target floor
+        self.waypoints: list[pygame.Vector2] = []
+
+    @property
+    def pos(self) -> pygame.Vector2:
+        return self.feet - (BOT_SIZE[0] / 2, BOT_SIZE[1])
+
+    def get_patrol_order(self) -> list[tuple[int, int]]:
+        """
+        The floors to try next as `(index, direction)`, going on the way we
+        face and turning around at the end, so unreachable ones are skipped
+        """
+
+        n_nodes = len(self.nodes)
+        index, direction = self.node_index, self.direction
+        ahead = range(index + direction, n_nodes if direction > 0 else -1, direction)
+        behind = range(index - direction, -1 if direction > 0 else n_nodes, -direction)
+        return [(i, direction) for i in ahead] + [(i, -direction) for i in behind]
+
+    def pick_target(self):
+        start = self.nodes[self.node_index]
+        if self.path_mode == "random":
+            order = [(random.randrange(len(self.nodes)), self.direction)]
+        else:
+            order = self.get_patrol_order()
+
+        for index, direction in order:
+            goal = self.nodes[index]
+            path = self.nav_graph.find_path(start, goal)
+            if path is not None:
+                break
+        else:
+            # Nothing in reach from here, tried again next update
+            return
+        self.node_index, self.direction = index, direction
+
+        y = start[1]
+        for edge in path:
+            self.waypoints.append(pygame.Vector2(edge.takeoff, y))
+            y = edge.target[1]
+            self.waypoints.append(pygame.Vector2(edge.landing, y))
+        self.waypoints.append(pygame.Vector2(goal[0] + goal[2] / 2, goal[1]))
+
+    def start(self):
+        self.client.start()
+
+    def close(self):
+        self.client.close()
+
+    def update(self, dt: float):
+        if not self.waypoints:
+            self.pick_target()
+
+        step = self.speed * dt
+        while self.waypoints and step > 0:
+            to_waypoint = self.waypoints[0] - self.feet
+            distance = to_waypoint.length()
+            if distance <= step:
+                self.feet.update(self.waypoints.pop(0))
+                step -= distance
+            else:
+                self.feet += to_waypoint * (step / distance)
+                step = 0
+
+        self.client.send_state(
+            make_state_packet(self.pos, BOT_SIZE, self.character_data)
+        )
+
+
+class BotSwarm:
+    """Drives many bots from one thread at a fixed send rate"""
+
+    def __init__(
+        self,
+        n_bots: int,
+        server_addr: tuple[str, int],
+        map_path: str = "assets/lobby_map.json",
+        path_mode: str = "random",
+        send_rate: float = 60,
+    ) -> None:
+        nav_graph = load_nav_graph(map_path)
+        self.bots = [Bot(i, server_addr, nav_graph, path_mode) for i in range(n_bots)]
+        self.send_rate = send_rate
+        self.is_running = False
+
+    def start(self):
+        for bot in self.bots:
+            bot.start()
+        self.is_running = True
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def close(self):
+        self.is_running = False
+        for bot in self.bots:
+            bot.close()
+
+    def run(self):
+        frame_time = 1 / self.send_rate
+        last = time.perf_counter()
+        while self.is_running:
+            now = time.perf_counter()
+            dt, last = now - last, now
+            for bot in self.bots:
+                bot.update(dt)
+            time.sleep(max(0.0, frame_time - (time.perf_counter() - now)))
+
+    def get_report(self) -> dict:
+        rtts = []
+        loss_ratios = []
+        snapshots_per_sec = []
+        for bot in self.bots:
+            snapshot = bot.client.stats.snapshot()
+            if snapshot["rtt"]["count"]:
+                rtts.append(snapshot["rtt"]["p50"])
+            loss_ratios.append(snapshot["sequence"]["loss_ratio"])
+            snapshots_per_sec.append(snapshot["packets_in_per_sec"])
+
+        rtts.sort()
+        return {
+            "bots": len(self.bots),
+            "joined": sum(bot.client.session_id is not None for bot in self.bots),
+            "rtt_p50": rtts[len(rtts) // 2] if rtts else None,
+            "rtt_max": rtts[-1] if rtts else None,
+            "loss_ratio": sum(loss_ratios) / len(loss_ratios),
+            "snapshots_per_sec": sum(snapshots_per_sec) / len(snapshots_per_sec),
+        }
+
+
+def run_step(n_bots: int, args, server: utils.UDPServer | None) -> dict:
+    if server is not None:
+        server.tick_duration.samples.clear()
+
+    swarm = BotSwarm(n_bots, args.server_addr, args.map, args.path, args.send_rate)
+    swarm.start()
+    time.sleep(args.duration)
+
+    report = swarm.get_report()
+    if server is not None:
+        tick = server.tick_duration.summary()
+        stats = server.stats.snapshot()
+        report.update(
+            {
+                "server_tick_p50": tick.get("p50"),
+                "server_tick_p95": tick.get("p95"),
+                "server_tick_max": tick.get("max"),
+                "server_tick_rate": server.tick_rate,
+                "server_bytes_out_per_sec": stats["bytes_out_per_sec"],
+            }
+        )
+    swarm.close()
+    # Give the server a moment to drop the departed sessions
+    time.sleep(0.5)
+    return report
+
+
+def print_report(report: dict):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.2f}ms"
+
+    line = (
+        f"bots={report['bots']:<4} joined={report['joined']:<4} "
+        f"rtt_p50={ms(report['rtt_p50'])} rtt_max={ms(report['rtt_max'])} "
+        f"loss={report['loss_ratio']:.3%} snaps/s={report['snapshots_per_sec']:.1f}"
+    )
+    if "server_tick_p50" in report:
+        line += (
+            f" tick_p50={ms(report['server_tick_p50'])}"
+            f" tick_p95={ms(report['server_tick_p95'])}"
+            f" tick_rate={report['server_tick_rate']:.1f}"
+            f" out={report['server_bytes_out_per_sec'] / 1024:.1f}KiB/s"
+        )
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test a game server with headless bot clients"
+    )
+    parser.add_argument(
+        "--bots",
+        default="8,16,32,64",
+        help="comma separated bot counts to ramp through (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--server",
+        metavar="IP:PORT",
+        help=(
+            "server to load. An in-process server is started when omitted, "
+            "which shares the interpreter with the bots"
+        ),
+    )
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--send-rate", type=float, default=60)
+    parser.add_argument("--path", choices=("random", "scripted"), default="random")
+    parser.add_argument("--map", default="assets/lobby_map.json")
+    parser.add_argument("--output", metavar="PATH", help="write the reports as JSON")
+    args = parser.parse_args()
+
+    bot_counts = [int(n) for n in args.bots.split(",")]
+    server = None
+    if args.server is None:
+        server = utils.UDPServer(shared.GAME_PORT, capacity=max(bot_counts))
+        server.start()
+        args.server_addr = (
+            socket.gethostbyname(socket.gethostname()),
+            shared.GAME_PORT,
+        )
+    else:
+        ip, _, port = args.server.rpartition(":")
+        args.server_addr = (ip, int(port))
+
+    reports = []
+    for n_bots in bot_counts:
+        report = run_step(n_bots, args, server)
+        print_report(report)
+        reports.append(report)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            ujson.dump(reports, f, indent=2)
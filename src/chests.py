@@ -7,10 +7,18 @@ class Chest:
     """Chest that pops out random items to pick up"""
 
     PLACEHOLDER_IMG_PATH = "assets/chest.png"
+    LIGHT_RADIUS = 120
+    LIGHT_COLOR = (255, 190, 90)
 
     def __init__(self, pos):
         self.pos = pygame.Vector2(pos)
         self.image = utils.load_image("assets/chest.png", False)
+        self.light = utils.Light(
+            self.image.get_rect(topleft=self.pos).center,
+            Chest.LIGHT_RADIUS,
+            Chest.LIGHT_COLOR,
+            static=True,
+        )
 
     @classmethod
     def get_placeholder_img(cls) -> pygame.Surface:
@@ -20,4 +28,4 @@ class Chest:
         pass
 
     def draw(self):
-        shared.screen.blit(self.image, shared.camera.transform(self.pos))
+        shared.camera.blit(self.image, self.pos)
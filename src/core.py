@@ -1,12 +1,26 @@
+import argparse
+import os
+import random
+import time
+
 import pygame
 
-from src import shared
+from src import shared, utils
+from src.replay import Recorder, Replayer
 from src.states import StateManager
 
+# Taken once the imports above are done, so interpreter start-up and importing
+# pygame are not part of the time to first frame
+STARTUP_TIME = time.perf_counter()
+
 
 class Core:
     def __init__(self) -> None:
         self.win_init()
+        shared.scheduler = utils.Scheduler()
+        shared.quality = utils.QualityController()
+        # Replays keep one level so they draw the same thing every run
+        shared.quality.is_enabled = shared.replayer is None
         self.state_manager = StateManager()
 
     def win_init(self):
@@ -17,8 +31,18 @@ class Core:
         shared.clock = pygame.Clock()
 
     def get_events(self):
+        if shared.replayer is not None:
+            # Replays run as fast as they can, the frame rate is left uncapped
+            shared.clock.tick()
+            pygame.event.pump()
+            # Recorded dts were clamped when live, fixed ones are used as given
+            shared.replayer.feed()
+            return
+
         shared.events = pygame.event.get()
         shared.dt = shared.clock.tick(60) / 1000
+        # The time the last frame spent working, without the wait for vsync
+        shared.quality.update(shared.clock.get_rawtime() / 1000)
         shared.dt = max(shared.dt, 0.1)
         shared.keys = pygame.key.get_pressed()
         shared.kp = pygame.key.get_just_pressed()
@@ -28,6 +52,9 @@ class Core:
         shared.mjp = pygame.mouse.get_just_pressed()
         shared.mjr = pygame.mouse.get_just_released()
 
+        if shared.recorder is not None:
+            shared.recorder.record_frame()
+
     def check_for_exit(self):
         for event in shared.events:
             if event.type == pygame.QUIT:
@@ -36,6 +63,9 @@ class Core:
     def update(self):
         self.get_events()
         self.check_for_exit()
+        utils.Collider.world.invalidate()
+        utils.Light.temp_lights.clear()
+        shared.scheduler.update(shared.dt)
         self.state_manager.update()
 
     def draw(self):
@@ -44,13 +74,95 @@ class Core:
         pygame.display.flip()
 
     def run(self):
-        while not shared.is_window_closed:
-            self.update()
-            self.draw()
+        try:
+            while not shared.is_window_closed:
+                self.update()
+                self.draw()
+                if shared.time_to_first_frame is None:
+                    shared.time_to_first_frame = time.perf_counter() - STARTUP_TIME
+                    if shared.show_startup_time:
+                        print(
+                            "Time to first frame: "
+                            f"{shared.time_to_first_frame * 1000:.1f}ms"
+                        )
+        finally:
+            self.state_manager.cleanup()
+            if shared.recorder is not None:
+                shared.recorder.close()
+            if shared.replayer is not None:
+                shared.replayer.close()
+                print(shared.replayer.get_report())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hell 2D")
+    parser.add_argument(
+        "--net-log",
+        metavar="PATH",
+        help="append network statistics as JSON lines to PATH",
+    )
+    parser.add_argument(
+        "--netem",
+        metavar="SPEC",
+        help=(
+            "route game traffic through a local network conditioner, "
+            "e.g. latency=80,jitter=20,loss=0.05,duplicate=0.01,reorder=0.02 "
+            "(latency and jitter in ms)"
+        ),
+    )
+    parser.add_argument(
+        "--record",
+        metavar="PATH",
+        help="record input and received snapshots to PATH",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="play back a recording made with --record instead of live input",
+    )
+    parser.add_argument(
+        "--replay-dt",
+        type=float,
+        metavar="SECONDS",
+        help="use a fixed dt for every replayed frame instead of the recorded one",
+    )
+    parser.add_argument(
+        "--startup-time",
+        action="store_true",
+        help="print how long the first frame took to show up",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="don't open a window, mostly useful with --replay",
+    )
+    args = parser.parse_args()
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    if args.replay_dt is not None and args.replay_dt <= 0:
+        parser.error("--replay-dt must be above 0")
+
+    if args.replay is not None:
+        shared.replayer = Replayer(args.replay, args.replay_dt)
+        random.seed(shared.replayer.seed)
+    elif args.record is not None:
+        seed = random.randrange(2**63)
+        shared.recorder = Recorder(args.record, seed)
+        random.seed(seed)
 
-        self.state_manager.cleanup()
+    shared.net_log_path = args.net_log
+    shared.show_startup_time = args.startup_time
+    if args.netem is not None:
+        try:
+            shared.network_conditions = utils.NetworkConditions.from_string(args.netem)
+        except ValueError as e:
+            parser.error(str(e))
 
 
 def main():
+    parse_args()
     core = Core()
     core.run()
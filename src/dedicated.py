@@ -0,0 +1,393 @@
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+import socket
+import struct
+import time
+
+import ujson
+
+from src import shared, utils
+from src.utils.packets import RECV_SIZE, tune_socket
+
+# Client ip, client port and lobby, in front of every datagram handed to a worker
+ROUTE = struct.Struct("!4sHH")
+
+
+def run_worker(
+    conn: multiprocessing.connection.Connection,
+    sock: socket.socket,
+    lobby_ids: list[int],
+    capacity: int,
+    map_data: bytes | None,
+    report_interval: float,
+):
+    """
+    Runs a share of the lobbies in a worker process. Datagrams come in over
+    `conn`, replies go straight out of the front-end's socket, and the load
+    of every lobby is sent back over `conn` every `report_interval` seconds.
+    """
+
+    lobbies = {
+        lobby_id: utils.UDPServer(0, capacity, map_data=map_data, sock=sock)
+        for lobby_id in lobby_ids
+    }
+    next_report = time.perf_counter() + report_interval
+    try:
+        while True:
+            next_tick = min(lobby.tick_if_due() for lobby in lobbies.values())
+            wake_at = min(next_tick, next_report)
+            # Handles what arrives until something is due, but never past it
+            while conn.poll(max(0.0, wake_at - time.perf_counter())):
+                message = conn.recv_bytes()
+                if not message:
+                    return
+                ip, port, lobby_id = ROUTE.unpack_from(message)
+                lobbies[lobby_id].on_datagram(
+                    message[ROUTE.size :], (socket.inet_ntoa(ip), port)
+                )
+                if time.perf_counter() >= wake_at:
+                    break
+
+            if time.perf_counter() >= next_report:
+                next_report += report_interval
+                conn.send_bytes(
+                    ujson.dumps(
+                        {
+                            lobby_id: lobby.get_load()
+                            for lobby_id, lobby in lobbies.items()
+                        }
+                    ).encode()
+                )
+    except (KeyboardInterrupt, EOFError, BrokenPipeError):
+        pass
+
+
+class LobbyWorker:
+    """The front-end's end of a worker process"""
+
+    def __init__(self, index: int, lobby_ids: list[int]) -> None:
+        self.index = index
+        self.lobby_ids = lobby_ids
+        self.conn: multiprocessing.connection.Connection | None = None
+        self.process: multiprocessing.Process | None = None
+        # Last reported load, keyed by lobby
+        self.loads: dict[int, dict] = {}
+
+    def start(self, sock, capacity, map_data, report_interval):
+        self.conn, worker_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=run_worker,
+            args=(
+                worker_conn,
+                sock,
+                self.lobby_ids,
+                capacity,
+                map_data,
+                report_interval,
+            ),
+            name=f"lobby-worker-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        worker_conn.close()
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.send_bytes(b"")
+            except OSError:
+                pass
+        if self.process is not None:
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+        if self.conn is not None:
+            self.conn.close()
+
+    def receive_reports(self):
+        while self.conn.poll():  # type: ignore
+            report = ujson.loads(self.conn.recv_bytes())  # type: ignore
+            self.loads.update({int(k): v for k, v in report.items()})
+
+
+class DedicatedServer:
+    """
+    Hosts many lobbies on one port, spread over worker processes.
+
+    The front-end owns the socket. It hands each client to a lobby when it
+    joins, filling lobbies one at a time, and forwards the client's
+    datagrams to the worker running that lobby. Workers send their replies
+    through the same socket, so clients only ever see the one address.
+    A client unheard of for `session_timeout` seconds is forgotten, just as
+    its lobby forgets its session.
+    """
+
+    def __init__(
+        self,
+        addr: tuple[str, int],
+        n_lobbies: int,
+        n_workers: int,
+        capacity: int = shared.MAX_PLAYERS,
+        map_data: bytes | None = None,
+        session_timeout: float = 5.0,
+        report_interval: float = 1.0,
+        load_log_path: str | None = None,
+    ) -> None:
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        tune_socket(self.socket)
+        self.socket.bind(addr)
+        self.socket.settimeout(0.1)
+        self.addr = self.socket.getsockname()
+
+        self.capacity = capacity
+        self.map_data = map_data
+        self.map_hash = None if map_data is None else utils.hash_map(map_data)
+        self.session_timeout = session_timeout
+        self.report_interval = report_interval
+        self.load_log_path = load_log_path
+
+        n_workers = max(1, min(n_workers, n_lobbies))
+        self.workers = [
+            LobbyWorker(i, list(range(i, n_lobbies, n_workers)))
+            for i in range(n_workers)
+        ]
+        self.lobby_workers = {
+            lobby_id: worker for worker in self.workers for lobby_id in worker.lobby_ids
+        }
+        # Which lobby each client was put in, and when it was last heard from
+        self.routes: dict[tuple[str, int], int] = {}
+        self.last_heard: dict[tuple[str, int], float] = {}
+        self.lobby_players = {lobby_id: 0 for lobby_id in self.lobby_workers}
+
+        # Only used on datagrams from clients that haven't joined yet
+        self.reassembler = utils.Reassembler(
+            max_fragments=utils.UDPServer.MAX_MESSAGE_FRAGMENTS,
+            max_size=utils.UDPServer.MAX_STATE_SIZE,
+        )
+        self.packer = utils.PacketPacker()
+        self.is_running = False
+
+    def start(self):
+        for worker in self.workers:
+            worker.start(
+                self.socket, self.capacity, self.map_data, self.report_interval
+            )
+        self.is_running = True
+
+    def close(self):
+        self.is_running = False
+        for worker in self.workers:
+            worker.close()
+        self.socket.close()
+
+    def run(self):
+        next_cleanup = time.perf_counter() + 1.0
+        next_report = time.perf_counter() + self.report_interval
+        while self.is_running:
+            try:
+                datagram, addr = self.socket.recvfrom(RECV_SIZE)
+            except socket.timeout:
+                datagram = None
+            except OSError:
+                if not self.is_running:
+                    break
+                datagram = None
+
+            if datagram is not None:
+                self.on_datagram(datagram, addr)
+
+            now = time.perf_counter()
+            if now >= next_cleanup:
+                next_cleanup = now + 1.0
+                self.forget_quiet_clients(now)
+                for worker in self.workers:
+                    worker.receive_reports()
+            if now >= next_report:
+                next_report = now + self.report_interval
+                self.report()
+
+    def on_datagram(self, datagram: bytes, addr: tuple[str, int]):
+        lobby_id = self.routes.get(addr)
+        if lobby_id is None:
+            lobby_id = self.route_new_client(datagram, addr)
+            if lobby_id is None:
+                return
+
+        self.last_heard[addr] = time.perf_counter()
+        worker = self.lobby_workers[lobby_id]
+        try:
+            worker.conn.send_bytes(  # type: ignore
+                ROUTE.pack(socket.inet_aton(addr[0]), addr[1], lobby_id) + datagram
+            )
+        except OSError:
+            pass
+
+    def route_new_client(self, datagram: bytes, addr) -> int | None:
+        """Puts a joining client into the fullest lobby with room left"""
+
+        data = self.reassembler.add(datagram, addr)
+        if data is None:
+            return None
+        try:
+            message = ujson.loads(data.decode())
+        except ValueError:
+            return None
+
+        if message.get("type") != "join":
+            # Probably forgotten while it was quiet, so it has to join again
+            self.send_message({"type": "kicked"}, addr)
+            return None
+
+        open_lobbies = [
+            lobby_id
+            for lobby_id, players in self.lobby_players.items()
+            if players < self.capacity
+        ]
+        if not open_lobbies:
+            self.send_message({"type": "full"}, addr)
+            return None
+
+        lobby_id = max(open_lobbies, key=lambda lobby_id: self.lobby_players[lobby_id])
+        self.routes[addr] = lobby_id
+        self.lobby_players[lobby_id] += 1
+        return lobby_id
+
+    def forget_quiet_clients(self, now: float):
+        for addr, last_heard in list(self.last_heard.items()):
+            if now - last_heard > self.session_timeout:
+                del self.last_heard[addr]
+                self.lobby_players[self.routes.pop(addr)] -= 1
+
+    def send_message(self, message: dict, addr):
+        for datagram in self.packer.pack(ujson.dumps(message).encode()):
+            try:
+                self.socket.sendto(datagram, addr)
+            except OSError:
+                pass
+
+    def get_report(self) -> dict:
+        lobbies = {}
+        for worker in self.workers:
+            for lobby_id in worker.lobby_ids:
+                load = dict(worker.loads.get(lobby_id, {}))
+                load["worker"] = worker.index
+                load["routed"] = self.lobby_players[lobby_id]
+                lobbies[lobby_id] = load
+
+        return {
+            "t": time.time(),
+            "players": len(self.routes),
+            "capacity": self.capacity * len(self.lobby_players),
+            "lobbies": lobbies,
+        }
+
+    def get_discovery_data(self) -> dict:
+        ip = self.addr[0]
+        if ip == "0.0.0.0":
+            ip = socket.gethostbyname(socket.gethostname())
+        tick_rates = [
+            load["tick_rate"]
+            for worker in self.workers
+            for load in worker.loads.values()
+            if load["players"]
+        ]
+        return {
+            "name": "dedicated",
+            "ip": ip,
+            "players": len(self.routes),
+            "capacity": self.capacity * len(self.lobby_players),
+            "tick_rate": round(sum(tick_rates) / len(tick_rates)) if tick_rates else 0,
+            "map_hash": self.map_hash,
+        }
+
+    def report(self):
+        report = self.get_report()
+        if self.load_log_path is not None:
+            with open(self.load_log_path, "a") as f:
+                f.write(ujson.dumps(report) + "\n")
+
+        busy = {
+            lobby_id: load
+            for lobby_id, load in report["lobbies"].items()
+            if load.get("players")
+        }
+        print(
+            f"players={report['players']}/{report['capacity']} "
+            f"busy_lobbies={len(busy)}/{len(report['lobbies'])}"
+        )
+        for lobby_id, load in busy.items():
+            tick_p95 = load.get("tick_p95")
+            print(
+                f"  lobby {lobby_id:<3} worker={load['worker']:<2} "
+                f"players={load['players']:<3} "
+                f"tick_rate={load['tick_rate']:.1f} "
+                f"tick_p95={'-' if tick_p95 is None else f'{tick_p95 * 1000:.2f}ms'} "
+                f"out={load['bytes_out_per_sec'] / 1024:.1f}KiB/s"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Host many lobbies from one machine, one worker process per core"
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=shared.GAME_PORT)
+    parser.add_argument("--lobbies", type=int, default=32)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes to spread the lobbies over (default: one per core)",
+    )
+    parser.add_argument("--capacity", type=int, default=shared.MAX_PLAYERS)
+    parser.add_argument("--map", default="assets/lobby_map.json")
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=5.0,
+        help="seconds between load reports (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--load-log", metavar="PATH", help="append load reports as JSON lines"
+    )
+    parser.add_argument(
+        "--no-discovery",
+        action="store_true",
+        help="don't answer LAN discovery probes",
+    )
+    args = parser.parse_args()
+
+    with open(args.map, "rb") as f:
+        map_data = f.read()
+
+    server = DedicatedServer(
+        (args.host, args.port),
+        args.lobbies,
+        args.workers,
+        args.capacity,
+        map_data,
+        report_interval=args.report_interval,
+        load_log_path=args.load_log,
+    )
+    server.start()
+    broadcast_server = None
+    if not args.no_discovery:
+        broadcast_server = utils.LocalBroadcastServer(
+            shared.DISCOVERY_PORT, server.get_discovery_data
+        )
+        broadcast_server.start()
+
+    print(
+        f"Serving {args.lobbies} lobbies on {server.addr[0]}:{server.addr[1]} "
+        f"with {len(server.workers)} workers"
+    )
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if broadcast_server is not None:
+            broadcast_server.close()
+        server.close()
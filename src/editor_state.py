@@ -8,13 +8,24 @@ CAMERA_SPEED = 100
 
 
 class EditorState:
+    persistent = True
+
     def __init__(self) -> None:
-        self.firepit = FirePit()
+        self.firepit = FirePit(is_lit=False)
         self.world_placement_handler = utils.WorldPlacementHandler(
             world_map=shared.world_map,
             starting_keybinds_file_name="1",
             bottom_bounds=shared.FIRE_PIT_START_Y,
         )
+        self.world = utils.WorldSnapshot()
+
+    def suspend(self):
+        self.world.save()
+        # Only the editors zoom, so nothing else should inherit it
+        shared.camera.zoom = 1.0
+
+    def resume(self):
+        self.world.restore()
 
     def scroll_camera(self):
         dx = shared.keys[pygame.K_d] - shared.keys[pygame.K_a]
@@ -24,7 +35,12 @@ class EditorState:
         if dv:
             dv.normalize_ip()
 
-        shared.camera.offset += dv * CAMERA_SPEED * shared.dt
+        # Same speed across the screen at any zoom
+        shared.camera.offset += dv * CAMERA_SPEED * shared.dt / shared.camera.zoom
+
+        for event in shared.events:
+            if event.type == pygame.MOUSEWHEEL:
+                shared.camera.step_zoom(event.y, shared.mouse_pos)
 
     def update(self):
         self.firepit.update()
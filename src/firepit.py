@@ -6,22 +6,72 @@ from src import shared, utils
 class FirePit:
     """Burning pit of hell, die if you fall into it"""
 
-    def __init__(self) -> None:
+    EMBERS_PER_SECOND = 900
+    EMBER_COLORS = ("gold", "orange", "orangered", "firebrick")
+    # Lights along the pit, one every GLOW_RADIUS
+    GLOW_RADIUS = 200
+    GLOW_COLOR = (255, 80, 20)
+
+    def __init__(self, is_lit: bool = True) -> None:
         self.image = utils.load_image("assets/firepit.png", True, bound=True)
         self.fire_width = self.image.get_width()
-        self.n_repeat = (shared.srect.width // self.image.get_width()) + 1
+
+        self.embers = utils.ParticleSystem(
+            utils.make_glow_sprites(list(FirePit.EMBER_COLORS)),
+            gravity=(0, -40),
+            drag=0.5,
+            blend_flags=pygame.BLEND_ADD,
+        )
+        self._embers_due = 0.0
+        # Glows only show up in states with a LightMap
+        self.is_lit = is_lit
+        self.glows: list[utils.Light] = []
 
     def update(self):
-        pass
+        # Only along the part of the pit that is on screen
+        self._embers_due += (
+            FirePit.EMBERS_PER_SECOND
+            * shared.quality.settings.particle_scale
+            * shared.dt
+        )
+        n_embers = int(self._embers_due)
+        self._embers_due -= n_embers
+        self.embers.emit(
+            n_embers,
+            area=(
+                shared.camera.offset.x,
+                shared.FIRE_PIT_START_Y,
+                shared.camera.view_size[0],
+                self.image.get_height() / 2,
+            ),
+            speed=(20, 90),
+            angle=(-120, -60),
+            life=(0.6, 2.0),
+            colors=tuple(range(len(FirePit.EMBER_COLORS))),
+        )
+        self.embers.update(shared.dt)
+        if self.is_lit:
+            self.update_glows()
+
+    def update_glows(self):
+        spacing = FirePit.GLOW_RADIUS
+        n_glows = int(shared.camera.view_size[0] // spacing) + 2
+        while len(self.glows) < n_glows:
+            self.glows.append(utils.Light((0, 0), spacing, FirePit.GLOW_COLOR))
+
+        # Snapped to the spacing, so the glows stay put as the camera moves
+        start_x = shared.camera.offset.x // spacing * spacing
+        y = shared.FIRE_PIT_START_Y + self.image.get_height() / 2
+        for i in range(n_glows):
+            glow = self.glows[i]
+            glow.pos.update(start_x + i * spacing, y)
+            utils.Light.temp_lights.append(glow)
 
     def draw(self):
-        for i in range(self.n_repeat):
-            shared.screen.blit(
+        view_width, _ = shared.camera.view_size
+        for i in range(int(view_width // self.fire_width) + 1):
+            shared.camera.blit(
                 self.image,
-                shared.camera.transform(
-                    (
-                        i * self.fire_width + shared.camera.offset.x,
-                        shared.FIRE_PIT_START_Y,
-                    )
-                ),
+                (i * self.fire_width + shared.camera.offset.x, shared.FIRE_PIT_START_Y),
             )
+        self.embers.draw()
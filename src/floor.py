@@ -22,7 +22,7 @@ class Floor:
         pass
 
     def draw(self):
-        shared.screen.blit(self.image, shared.camera.transform(self.collider.pos))
+        shared.camera.blit(self.image, self.collider.pos)
 
 
 class Rose:
@@ -44,7 +44,7 @@ class Rose:
         pass
 
     def draw(self):
-        shared.screen.blit(self.image, shared.camera.transform(self.collider.pos))
+        shared.camera.blit(self.image, self.collider.pos)
 
 
 class Sunflower:
@@ -66,4 +66,4 @@ class Sunflower:
         pass
 
     def draw(self):
-        shared.screen.blit(self.image, shared.camera.transform(self.collider.pos))
+        shared.camera.blit(self.image, self.collider.pos)
@@ -2,20 +2,37 @@ import pygame
 
 from src import shared, utils
 from src.enums import State
+from src.firepit import FirePit
 
 
 class GameState:
+    persistent = True
+
     def __init__(self) -> None:
         self.clean_up_world()
         self.entities = shared.world_map.load()
+        self.firepit = FirePit()
+        self.lighting = utils.LightMap(utils.Light.static_lights)
+        self.world = utils.WorldSnapshot()
 
     def clean_up_world(self):
         utils.Collider.all_colliders.clear()
+        utils.Light.static_lights.clear()
+
+    def suspend(self):
+        self.world.save()
+
+    def resume(self):
+        self.world.restore()
 
     def update(self):
+        self.firepit.update()
         for entity in self.entities:
             entity.update()
 
     def draw(self):
+        self.firepit.draw()
         for entity in self.entities:
             entity.draw()
+        if shared.quality.settings.lighting:
+            self.lighting.draw()
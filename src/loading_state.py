@@ -0,0 +1,36 @@
+import pygame
+
+from src import shared, utils
+from src.enums import State
+
+
+class LoadingState:
+    """Shown while the background loader finishes, then moves on to `target`"""
+
+    BAR_SIZE = (400, 20)
+
+    def __init__(self, loader: utils.BackgroundLoader, target: State) -> None:
+        self.loader = loader
+        self.target = target
+        self.font = utils.load_font(None, 32)
+        self.bar_rect = pygame.Rect((0, 0), LoadingState.BAR_SIZE)
+        self.bar_rect.center = shared.srect.center
+
+    def update(self):
+        if self.loader.is_done:
+            self.loader.wait()
+            shared.next_state = self.target
+
+    def draw(self):
+        text_surf = self.font.render(
+            f"Loading {self.loader.current_job}...", True, "white"
+        )
+        shared.screen.blit(
+            text_surf,
+            text_surf.get_rect(midbottom=(self.bar_rect.centerx, self.bar_rect.y - 10)),
+        )
+
+        fill_rect = self.bar_rect.copy()
+        fill_rect.width = int(self.bar_rect.width * self.loader.progress)
+        pygame.draw.rect(shared.screen, "tomato", fill_rect)
+        pygame.draw.rect(shared.screen, "white", self.bar_rect, width=2)
@@ -4,16 +4,31 @@ import pygame
 
 from src import shared, utils
 from src.enums import State
+from src.player import Player
 
 CAMERA_SPEED = 100
 
 
 class LobbyEditorState:
+    persistent = True
+
     def __init__(self) -> None:
         self.world_placement_handler = utils.WorldPlacementHandler(
             world_map=shared.lobby_map, starting_keybinds_file_name="1"
         )
         self.goto_menu_btn = utils.Button("< Menu", pygame.Rect(20, 20, 140, 30))
+        self.world = utils.WorldSnapshot()
+        # Followed along as floors are placed, so saving the map also saves
+        # a navigation graph that bots can load without building it
+        shared.lobby_map.get_nav_graph(Player.NAV_BODY)
+
+    def suspend(self):
+        self.world.save()
+        # Only the editors zoom, so nothing else should inherit it
+        shared.camera.zoom = 1.0
+
+    def resume(self):
+        self.world.restore()
 
     def scroll_camera(self):
         dx = shared.keys[pygame.K_d] - shared.keys[pygame.K_a]
@@ -23,7 +38,12 @@ class LobbyEditorState:
         if dv:
             dv.normalize_ip()
 
-        shared.camera.offset += dv * CAMERA_SPEED * shared.dt
+        # Same speed across the screen at any zoom
+        shared.camera.offset += dv * CAMERA_SPEED * shared.dt / shared.camera.zoom
+
+        for event in shared.events:
+            if event.type == pygame.MOUSEWHEEL:
+                shared.camera.step_zoom(event.y, shared.mouse_pos)
 
     def update(self):
         self.goto_menu_btn.update()
@@ -2,43 +2,160 @@ import random
 import socket
 
 import pygame
-import ujson
 
 from src import shared, utils
+from src.enums import State
 from src.player import ClientSpawnPoint, OtherClientHandler
 
 
 class LobbyState:
+    # Kept alive by the StateManager when leaving, so the world and the
+    # network session survive a trip to the menu
+    persistent = True
+
     def __init__(self) -> None:
         self.clean_up_world()
+        self.is_host = shared.is_host
+        self.map_cache = utils.MapCache(shared.MAP_CACHE_DIR)
         self.setup_network()
-        self.entities = shared.lobby_map.load()
-        ClientSpawnPoint.create_device_player()
         self.other_client_handler = OtherClientHandler()
+        self.goto_menu_btn = utils.Button("< Menu", pygame.Rect(20, 20, 140, 30))
+        self.world = utils.WorldSnapshot(ClientSpawnPoint.points)
+
+        # Joiners play on the host's map, which may have to be fetched first
+        self.entities = []
+        self.player = None
+        if self.is_host or shared.replayer is not None:
+            self.load_world(shared.lobby_map)
+
+    def load_world(self, world_map: utils.WorldMap):
+        self.entities = world_map.load()
+        self.lighting = utils.LightMap(utils.Light.static_lights)
+        ClientSpawnPoint.create_device_player()
+        self.player = shared.player
+
+    def wait_for_map(self):
+        """Loads the host's map once it's known and on disk"""
+
+        map_hash = self.client.map_hash
+        if map_hash is None:
+            return
+        if map_hash == shared.lobby_map.hash:
+            self.load_world(shared.lobby_map)
+            return
+
+        if map_hash not in self.map_cache:
+            if self.client.map_data is None:
+                self.client.download_map()
+                return
+            self.map_cache.put(self.client.map_data)
+
+        world_map = utils.WorldMap(
+            self.map_cache.get_path(map_hash), shared.lobby_map.entity_classes
+        )
+        if world_map.hash != map_hash:
+            # Damaged on disk, so it's fetched again
+            self.map_cache.remove(map_hash)
+            return
+        self.load_world(world_map)
 
     def setup_network(self):
-        if shared.is_host:
-            DEVICE_IP = socket.gethostbyname(socket.gethostname())
-            data = {"name": shared.character_data.name, "ip": DEVICE_IP}
-            utils.LocalBroadcastServer(
-                discovery_port=shared.DISCOVERY_PORT,
-                broadcast_data=ujson.dumps(data).encode(),
-            ).start()
+        self.font = utils.load_font(None, 32)
+        self.conditioner = None
+        if shared.replayer is not None:
+            shared.client = shared.replayer.client
+            self.server_ip = getattr(shared, "server_ip", None)
+            self.client = shared.client
+            self.net_stats_overlay = utils.NetStatsOverlay([shared.client.stats])
+            return
 
+        if shared.is_host:
             shared.server_ip = socket.gethostbyname(socket.gethostname())
-            self.server = utils.UDPServer(shared.GAME_PORT)
+            self.server = utils.UDPServer(
+                shared.GAME_PORT,
+                shared.MAX_PLAYERS,
+                shared.net_log_path,
+                self.make_packer(),
+                interest_size=shared.srect.size,
+                map_data=shared.lobby_map.read_raw(),
+            )
             self.server.start()
 
-        shared.client = utils.UDPClient(shared.server_ip, shared.GAME_PORT)
+            self.broadcast_server = utils.LocalBroadcastServer(
+                discovery_port=shared.DISCOVERY_PORT,
+                get_broadcast_data=self.get_discovery_data,
+            )
+            self.broadcast_server.start()
+
+        server_addr = (shared.server_ip, shared.GAME_PORT)
+        if shared.network_conditions is not None:
+            self.conditioner = utils.NetworkConditioner(
+                server_addr, shared.network_conditions
+            )
+            self.conditioner.start()
+            server_addr = self.conditioner.addr
+
+        shared.client = utils.UDPClient(
+            *server_addr, shared.net_log_path, self.make_packer()
+        )
         shared.client.start()
-        self.font = utils.load_font(None, 32)
+        self.server_ip = shared.server_ip
+        self.client = shared.client
+
+        stats = [shared.client.stats]
+        if shared.is_host:
+            stats.append(self.server.stats)
+        self.net_stats_overlay = utils.NetStatsOverlay(stats)
+
+    def make_packer(self) -> utils.PacketPacker:
+        return utils.PacketPacker(
+            mtu=shared.PACKET_MTU, compress=shared.COMPRESS_PACKETS
+        )
+
+    def get_discovery_data(self) -> dict:
+        return {
+            "name": shared.character_data.name,
+            "ip": shared.server_ip,
+            "players": len(self.server.sessions),
+            "capacity": self.server.capacity,
+            "tick_rate": round(self.server.tick_rate),
+            "map_hash": self.server.map_hash,
+        }
 
     def clean_up_world(self):
         utils.Collider.temp_colliders.clear()
         utils.Collider.all_colliders.clear()
+        utils.Light.static_lights.clear()
         ClientSpawnPoint.points.clear()
 
+    def can_resume(self) -> bool:
+        """A pooled lobby is only reused for the same server and map"""
+
+        if self.is_host != shared.is_host:
+            return False
+        if self.is_host:
+            # The lobby editor may have changed the map since
+            return self.server.map_hash == shared.lobby_map.hash
+        return self.server_ip == shared.server_ip
+
+    def suspend(self):
+        self.world.save()
+
+    def resume(self):
+        self.world.restore()
+        shared.client = self.client
+        shared.player = self.player
+
     def update(self):
+        self.goto_menu_btn.update()
+        if self.goto_menu_btn.just_clicked:
+            shared.next_state = State.MENU
+
+        self.net_stats_overlay.update()
+        if self.player is None:
+            self.wait_for_map()
+            return
+
         utils.Collider.temp_colliders.clear()
 
         for entity in self.entities:
@@ -48,9 +165,37 @@ class LobbyState:
         shared.player.update()
 
     def draw(self):
+        if self.player is None:
+            self.draw_map_progress()
+            return
+
         self.other_client_handler.draw()
         shared.player.draw()
         for entity in self.entities:
             entity.draw()
+        if shared.quality.settings.lighting:
+            self.lighting.draw()
 
         shared.screen.blit(self.font.render("Lobby", True, "white"), (100, 100))
+        self.goto_menu_btn.draw()
+        self.net_stats_overlay.draw()
+
+    def draw_map_progress(self):
+        download = self.client.map_download
+        if download is None:
+            text = "Joining..."
+        else:
+            text = f"Downloading map {download.progress:.0%}"
+        surf = self.font.render(text, True, "white")
+        shared.screen.blit(surf, surf.get_rect(center=shared.srect.center))
+        self.goto_menu_btn.draw()
+        self.net_stats_overlay.draw()
+
+    def cleanup(self):
+        self.net_stats_overlay.close()
+        self.client.close()
+        if self.conditioner is not None:
+            self.conditioner.close()
+        if self.is_host and shared.replayer is None:
+            self.broadcast_server.close()
+            self.server.close()
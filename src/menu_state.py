@@ -32,16 +32,19 @@ class MenuState:
                 ]
             )
         ]
-        shared.character_data = CharacterData(
-            name=f"guest_{random.randint(1, 69)}",
-            hair="default_hair",
-            face="default_face",
-            outfit="default_outfit",
-        )
+        # Kept across visits to the menu, a pooled lobby is still using it
+        if not hasattr(shared, "character_data"):
+            shared.character_data = CharacterData(
+                name=f"guest_{random.randint(1, 69)}",
+                hair="default_hair",
+                face="default_face",
+                outfit="default_outfit",
+            )
 
     def update(self):
         for btn in self.buttons:
             if btn.text == "Join Game" and btn.just_clicked:
+                shared.is_host = False
                 shared.next_state = State.SERVER_FINDER
             elif btn.text == "Host Game" and btn.just_clicked:
                 shared.is_host = True
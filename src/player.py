@@ -1,4 +1,5 @@
 import random
+import time
 import typing as t
 from dataclasses import asdict, dataclass
 
@@ -24,7 +25,32 @@ class CharacterData:
         return cls(**ujson.loads(json_str))
 
 
+def make_state_packet(
+    pos,
+    size,
+    character_data: CharacterData,
+    angle: float = 0.0,
+    flip_x: bool = False,
+) -> dict:
+    """The state a client sends to the server every frame"""
+
+    packet = {
+        "pos": [pos[0], pos[1]],
+        "size": size,
+        "character_data": character_data.to_json(),
+    }
+    # Left out when unused so the common case doesn't grow every snapshot
+    if angle:
+        packet["angle"] = angle
+    if flip_x:
+        packet["flip"] = True
+    return packet
+
+
 class OutfitManager:
+    # Rotated and flipped frames, shared by every player wearing the same outfit
+    transform_cache = utils.SpriteTransformCache()
+
     def __init__(
         self,
         hair="default_hair",
@@ -32,6 +58,7 @@ class OutfitManager:
         outfit="default_outfit",
         scale: float = 1.0,
     ) -> None:
+        self.key = (hair, face, outfit, scale)
         self.hair = utils.load_image(
             f"assets/{hair}.png", True, bound=True, scale=scale
         )
@@ -57,8 +84,22 @@ class OutfitManager:
     def update(self):
         pass
 
-    def draw(self, rect):
-        shared.screen.blit(self.image, shared.camera.transform(rect))
+    def draw(self, rect, angle: float = 0.0, flip_x: bool = False):
+        image = OutfitManager.transform_cache.get(self.key, self.image, angle, flip_x)
+        if image is self.image:
+            shared.camera.blit(image, rect)
+            return
+        image = shared.camera.scale(image)
+
+        # Rotated frames are larger, so they are kept centred on the player
+        screen_rect = shared.camera.transform(rect)
+        shared.screen.blit(
+            image,
+            (
+                screen_rect.centerx - image.get_width() / 2,
+                screen_rect.centery - image.get_height() / 2,
+            ),
+        )
 
 
 class ClientSpawnPoint:
@@ -84,46 +125,105 @@ class ClientSpawnPoint:
 
 
 class OtherClientHandler:
+    # Peers the server stops telling us about are forgotten after this long.
+    # Far away peers are only sent every few ticks, so this has to be longer
+    # than the server's far update interval.
+    PEER_TIMEOUT = 1.0
+
     def __init__(self) -> None:
-        self.clients = []
-        self.colliders = []
+        self.clients: dict[int, dict] = {}
+        self.last_seen: dict[int, float] = {}
+        # One collider per peer, moved every frame instead of being rebuilt
+        self.colliders: dict[int, utils.Collider] = {}
+        self.torches: dict[int, utils.Light] = {}
+        # (character data json, outfit, name surf) per peer, rebuilt on change
+        self.looks: dict[int, tuple[str, OutfitManager, pygame.Surface]] = {}
+        self.last_seq = None
 
         self.name_font = utils.load_font(None, 24)
 
+    def merge_snapshot(self):
+        state = shared.client.received_state
+        if not state or state["seq"] == self.last_seq:
+            return
+        self.last_seq = state["seq"]
+
+        now = time.perf_counter()
+        for client in state["clients"]:
+            self.clients[client["id"]] = client
+            self.last_seen[client["id"]] = now
+
+        for client_id, last_seen in list(self.last_seen.items()):
+            if now - last_seen > OtherClientHandler.PEER_TIMEOUT:
+                del self.clients[client_id]
+                del self.last_seen[client_id]
+                self.colliders.pop(client_id, None)
+                self.torches.pop(client_id, None)
+                self.looks.pop(client_id, None)
+
     def update(self):
-        data = shared.client.received_data.decode()
-        self.colliders.clear()
-        if data:
-            self.clients = ujson.loads(data)
-            for client in self.clients:
-                collider = utils.Collider(
+        self.merge_snapshot()
+        for client_id, client in self.clients.items():
+            collider = self.colliders.get(client_id)
+            if collider is None:
+                collider = self.colliders[client_id] = utils.Collider(
                     size=client["size"], pos=client["pos"], temp=True
                 )
-                self.colliders.append(collider)
-                utils.Collider.temp_colliders.append(collider)
+            else:
+                collider.move_to(client["pos"], client["size"])
+            utils.Collider.temp_colliders.append(collider)
+
+            torch = self.torches.get(client_id)
+            if torch is None:
+                torch = self.torches[client_id] = utils.Light(
+                    (0, 0), Player.TORCH_RADIUS, Player.TORCH_COLOR
+                )
+            torch.pos.update(collider.rect.center)
+            utils.Light.temp_lights.append(torch)
+
+    def get_look(
+        self, client_id: int, character_json: str
+    ) -> tuple[str, OutfitManager, pygame.Surface]:
+        look = self.looks.get(client_id)
+        if look is not None and look[0] == character_json:
+            return look
+
+        character_data = CharacterData.from_json(character_json)
+        outfit = OutfitManager(
+            hair=character_data.hair,
+            face=character_data.face,
+            outfit=character_data.outfit,
+            scale=0.4,
+        )
+        name_surf = self.name_font.render(character_data.name, True, "tomato")
+        look = self.looks[client_id] = (character_json, outfit, name_surf)
+        return look
 
     def draw(self):
-        for collider, client in zip(self.colliders, self.clients):
-            character_data = CharacterData.from_json(client["character_data"])
-            outfit = OutfitManager(
-                hair=character_data.hair,
-                face=character_data.face,
-                outfit=character_data.outfit,
-                scale=0.4,
-            )
-            outfit.draw(collider.rect)
-
-            name_surf = self.name_font.render(character_data.name, True, "tomato")
-            name_rect = name_surf.get_rect(
-                midbottom=pygame.Vector2(collider.rect.midtop) - (0, 10)
-            )
-
-            shared.screen.blit(name_surf, shared.camera.transform(name_rect))
+        for client_id, client in self.clients.items():
+            collider = self.colliders.get(client_id)
+            if collider is None:
+                continue
+            quality = shared.quality.settings
+            _, outfit, name_surf = self.get_look(client_id, client["character_data"])
+            rect = collider.rect
+            if quality.outfit_detail:
+                outfit.draw(rect, client.get("angle", 0.0), client.get("flip", False))
+            else:
+                outfit.draw(rect)
+
+            if quality.name_tags:
+                name_rect = name_surf.get_rect(midbottom=(rect.centerx, rect.top - 10))
+                shared.screen.blit(name_surf, shared.camera.transform(name_rect))
 
 
 class Player:
     JUMP_VELOCITY = -150
     MAX_HORIZONTAL_SPEED = 40
+    # Where a player can get to, sized like one in the default outfit
+    NAV_BODY = utils.NavBody((28, 84), MAX_HORIZONTAL_SPEED, JUMP_VELOCITY)
+    TORCH_RADIUS = 180
+    TORCH_COLOR = (255, 160, 100)
 
     def __init__(self, pos) -> None:
         self.outfit = OutfitManager(
@@ -133,7 +233,11 @@ class Player:
             scale=0.4,
         )
         self.collider = utils.Collider(size=self.outfit.image.get_size(), pos=pos)
+        self.torch = utils.Light(pos, Player.TORCH_RADIUS, Player.TORCH_COLOR)
         self.gravity = utils.Gravity()
+        # How the sprite is drawn, in degrees and whether it faces left
+        self.angle = 0.0
+        self.is_flipped = False
 
         self.name_surf = utils.load_font(None, 24).render("You", True, "seagreen")
         self.name_rect = self.name_surf.get_rect()
@@ -143,15 +247,43 @@ class Player:
         return self.collider.pos
 
     def update(self):
+        move_x = shared.keys[pygame.K_d] - shared.keys[pygame.K_a]
+        is_jumping = shared.kp[pygame.K_SPACE]
+        # Standing still on something that hasn't moved, so moving would
+        # only end up where we already are
+        if self.collider.is_sleeping and (
+            move_x or is_jumping or not self.collider.can_keep_sleeping()
+        ):
+            self.collider.wake()
+        if not self.collider.is_sleeping:
+            self.move(move_x, is_jumping)
+
+        rect = self.collider.rect
+        self.name_rect.midbottom = (rect.centerx, rect.top - 10)
+        self.torch.pos.update(rect.center)
+        utils.Light.temp_lights.append(self.torch)
+
+        shared.client.send_state(
+            make_state_packet(
+                self.collider.pos,
+                self.collider.size,
+                shared.character_data,
+                self.angle,
+                self.is_flipped,
+            )
+        )
+        shared.camera.attach_to(self.collider.pos)
+
+    def move(self, move_x: int, is_jumping: bool):
         dx, dy = 0, 0
         self.gravity.update()
 
-        if shared.kp[pygame.K_SPACE]:
+        if is_jumping:
             self.gravity.velocity = Player.JUMP_VELOCITY
 
         dy += self.gravity.velocity * shared.dt
 
-        dx += shared.keys[pygame.K_d] - shared.keys[pygame.K_a]
+        dx += move_x
         dx *= Player.MAX_HORIZONTAL_SPEED * shared.dt
 
         collider_data = self.collider.get_collision_data(dx, dy)
@@ -171,19 +303,10 @@ class Player:
         self.collider.pos += dx, dy
         if self.collider.pos.y > 1000:
             self.collider.pos = random.choice(ClientSpawnPoint.points).copy()
-        self.name_rect.midbottom = pygame.Vector2(self.collider.rect.midtop) - (0, 10)
-
-        shared.client.send(
-            ujson.dumps(
-                {
-                    "pos": [self.collider.pos.x, self.collider.pos.y],
-                    "size": self.collider.size,
-                    "character_data": shared.character_data.to_json(),
-                }
-            ).encode()
-        )
-        shared.camera.attach_to(self.collider.pos)
+        elif not move_x and utils.CollisionSide.BOTTOM in collider_data.colliders:
+            self.collider.sleep_on(collider_data.colliders[utils.CollisionSide.BOTTOM])
 
     def draw(self):
-        shared.screen.blit(self.name_surf, shared.camera.transform(self.name_rect))
-        self.outfit.draw(self.collider.rect)
+        if shared.quality.settings.name_tags:
+            shared.screen.blit(self.name_surf, shared.camera.transform(self.name_rect))
+        self.outfit.draw(self.collider.rect, self.angle, self.is_flipped)
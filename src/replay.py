@@ -0,0 +1,237 @@
+import gzip
+import struct
+import time
+from collections import deque
+
+import pygame
+import ujson
+
+from src import shared, utils
+
+MAGIC = b"H2DR"
+VERSION = 2
+# magic, version, random seed
+HEADER = struct.Struct("<4sHQ")
+# dt, mouse x, mouse y, mouse_press, mjp, mjr, flags
+FRAME = struct.Struct("<fffBBBB")
+COUNT = struct.Struct("<H")
+KEY = struct.Struct("<I")
+WHEEL = struct.Struct("<i")
+LENGTH = struct.Struct("<I")
+
+FLAG_QUIT = 1
+
+ALL_KEYS = sorted(
+    {getattr(pygame, name) for name in dir(pygame) if name.startswith("K_")}
+)
+
+
+class KeyState:
+    """Stands in for the sequences returned by `pygame.key.get_pressed` and co."""
+
+    def __init__(self, pressed: set[int]) -> None:
+        self.pressed = pressed
+
+    def __getitem__(self, key: int) -> bool:
+        return key in self.pressed
+
+
+def pack_buttons(buttons) -> int:
+    mask = 0
+    for i, pressed in enumerate(buttons):
+        if pressed:
+            mask |= 1 << i
+    return mask
+
+
+def unpack_buttons(mask: int, n_buttons: int = 5) -> tuple[bool, ...]:
+    return tuple(bool(mask & (1 << i)) for i in range(n_buttons))
+
+
+class ReplayClient:
+    """Plays back recorded snapshots in place of a `UDPClient`"""
+
+    def __init__(self) -> None:
+        self.session_id = 0
+        self.received_data: bytes = b""
+        self.received_state: dict = {}
+        self.received_hits: deque[dict] = deque()
+        self.stats = utils.NetStats("replay")
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, data: bytes):
+        pass
+
+    def send_state(self, state: dict):
+        pass
+
+    def send_hitscan(self, origin, direction, max_distance: float):
+        pass
+
+    def send_melee(self, rect):
+        pass
+
+    def feed(self, data: bytes):
+        self.received_data = data
+        self.received_state = ujson.loads(data)
+
+
+class Recorder:
+    """Writes the input `shared` sees every frame, plus new snapshots, to a log"""
+
+    def __init__(self, path: str, seed: int) -> None:
+        self.file = gzip.open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed))
+        self._last_payload = b""
+
+    def write_keys(self, keys):
+        pressed = [key for key in ALL_KEYS if keys[key]]
+        self.file.write(COUNT.pack(len(pressed)))
+        for key in pressed:
+            self.file.write(KEY.pack(key))
+
+    def record_frame(self):
+        flags = 0
+        text_inputs = []
+        wheel_steps = []
+        for event in shared.events:
+            if event.type == pygame.QUIT:
+                flags |= FLAG_QUIT
+            elif event.type == pygame.TEXTINPUT:
+                text_inputs.append(event.text.encode())
+            elif event.type == pygame.MOUSEWHEEL:
+                wheel_steps.append(event.y)
+
+        self.file.write(
+            FRAME.pack(
+                shared.dt,
+                shared.mouse_pos.x,
+                shared.mouse_pos.y,
+                pack_buttons(shared.mouse_press),
+                pack_buttons(shared.mjp),
+                pack_buttons(shared.mjr),
+                flags,
+            )
+        )
+        for keys in (shared.keys, shared.kp, shared.kr):
+            self.write_keys(keys)
+
+        self.file.write(COUNT.pack(len(text_inputs)))
+        for text in text_inputs:
+            self.file.write(LENGTH.pack(len(text)) + text)
+
+        self.file.write(COUNT.pack(len(wheel_steps)))
+        for y in wheel_steps:
+            self.file.write(WHEEL.pack(y))
+
+        payload = b""
+        client = getattr(shared, "client", None)
+        if client is not None and client.received_data is not self._last_payload:
+            payload = self._last_payload = client.received_data
+        self.file.write(LENGTH.pack(len(payload)) + payload)
+
+    def close(self):
+        self.file.close()
+
+
+class Replayer:
+    """
+    Feeds a recorded log back through `shared`, one frame per call.
+
+    With `fixed_dt` set every frame uses it instead of the recorded dt, so
+    the simulation doesn't depend on how fast the replay runs.
+    """
+
+    def __init__(self, path: str, fixed_dt: float | None = 1 / 60) -> None:
+        self.file = gzip.open(path, "rb")
+        magic, version, self.seed = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"`{path}` is not a version {VERSION} replay")
+
+        self.fixed_dt = fixed_dt
+        self.client = ReplayClient()
+        self.is_finished = False
+        self.frame_count = 0
+        self.frame_times: list[float] = []
+        self._last_frame_start = None
+
+    def read(self, st: struct.Struct) -> tuple:
+        data = self.file.read(st.size)
+        if len(data) < st.size:
+            raise EOFError
+        return st.unpack(data)
+
+    def read_keys(self) -> KeyState:
+        (count,) = self.read(COUNT)
+        return KeyState({self.read(KEY)[0] for _ in range(count)})
+
+    def read_bytes(self) -> bytes:
+        (length,) = self.read(LENGTH)
+        return self.file.read(length)
+
+    def feed(self):
+        """Loads the next recorded frame into `shared`"""
+
+        now = time.perf_counter()
+        if self._last_frame_start is not None:
+            self.frame_times.append(now - self._last_frame_start)
+        self._last_frame_start = now
+
+        try:
+            dt, mx, my, mouse_press, mjp, mjr, flags = self.read(FRAME)
+            keys, kp, kr = self.read_keys(), self.read_keys(), self.read_keys()
+            (n_text_inputs,) = self.read(COUNT)
+            text_inputs = [self.read_bytes().decode() for _ in range(n_text_inputs)]
+            (n_wheel_steps,) = self.read(COUNT)
+            wheel_steps = [self.read(WHEEL)[0] for _ in range(n_wheel_steps)]
+            payload = self.read_bytes()
+        except EOFError:
+            self.is_finished = True
+            shared.is_window_closed = True
+            shared.events = []
+            return
+
+        shared.events = [
+            pygame.event.Event(pygame.TEXTINPUT, text=text) for text in text_inputs
+        ]
+        shared.events += [
+            pygame.event.Event(
+                pygame.MOUSEWHEEL, x=0, y=y, precise_x=0.0, precise_y=float(y)
+            )
+            for y in wheel_steps
+        ]
+        if flags & FLAG_QUIT:
+            shared.events.append(pygame.event.Event(pygame.QUIT))
+
+        shared.dt = dt if self.fixed_dt is None else self.fixed_dt
+        shared.keys, shared.kp, shared.kr = keys, kp, kr  # type: ignore
+        shared.mouse_pos = pygame.Vector2(mx, my)
+        shared.mouse_press = unpack_buttons(mouse_press, 3)
+        shared.mjp = unpack_buttons(mjp)  # type: ignore
+        shared.mjr = unpack_buttons(mjr)  # type: ignore
+        if payload:
+            self.client.feed(payload)
+        self.frame_count += 1
+
+    def get_report(self) -> dict:
+        frame_times = sorted(self.frame_times)
+        if not frame_times:
+            return {"frames": self.frame_count}
+
+        last = len(frame_times) - 1
+        return {
+            "frames": self.frame_count,
+            "total_time": sum(frame_times),
+            "frame_time_mean": sum(frame_times) / len(frame_times),
+            "frame_time_p50": frame_times[last // 2],
+            "frame_time_p95": frame_times[int(last * 0.95)],
+            "frame_time_max": frame_times[last],
+        }
+
+    def close(self):
+        self.file.close()
@@ -1,35 +1,75 @@
 import pygame
-import ujson
 
 from src import shared, utils
 from src.enums import State
 
 
 class ServerFinderState:
+    START_X = 300
+    BUTTON_HEIGHT = 50
+    PADDING = 10
+
     def __init__(self) -> None:
         self.font = utils.load_font(None, 32)
         self.host_finder = utils.LocalBroadcastClient(
             discovery_port=shared.DISCOVERY_PORT
         )
         self.host_finder.start_receiving()
-        self.buttons: list[utils.Button] = []
+        self.hosts: list[utils.DiscoveredHost] = []
+        self.buttons: dict[tuple[str, int], utils.Button] = {}
+
+    def get_button_rect(self, i: int) -> pygame.Rect:
+        bw = shared.srect.width - ServerFinderState.START_X * 2
+        bh = ServerFinderState.BUTTON_HEIGHT
+        return pygame.Rect(
+            ServerFinderState.START_X,
+            50 + (bh + ServerFinderState.PADDING) * i,
+            bw,
+            bh,
+        )
+
+    @staticmethod
+    def get_label(host: utils.DiscoveredHost) -> str:
+        label = host.data["name"]
+        if "players" in host.data:
+            label += f"  {host.data['players']}/{host.data['capacity']}"
+        if host.rtt is not None:
+            label += f"  {host.rtt * 1000:.0f} ms"
+        return label
+
+    def sync_buttons(self):
+        """Keeps one button per live host, only touching the ones that changed"""
+
+        live_addrs = {host.addr for host in self.hosts}
+        for addr in list(self.buttons):
+            if addr not in live_addrs:
+                del self.buttons[addr]
+
+        for i, host in enumerate(self.hosts):
+            btn = self.buttons.get(host.addr)
+            if btn is None:
+                btn = utils.Button(self.get_label(host), self.get_button_rect(i))
+                self.buttons[host.addr] = btn
+            else:
+                btn.text = self.get_label(host)
+                btn.rect.topleft = self.get_button_rect(i).topleft
 
     def update(self):
-        self.buttons = []
-        for i, data in enumerate(self.host_finder.received_data):
-            data = ujson.loads(data.decode())
-            start_x = 300
-            bw, bh = shared.srect.width - start_x * 2, 50
-            pad = 10
-            rect = pygame.Rect(start_x, 50 + (bh + pad) * i, bw, bh)
-            btn = utils.Button(data["name"], rect)
+        self.hosts = self.host_finder.get_hosts(max_rtt=shared.MAX_LOBBY_RTT)
+        self.sync_buttons()
+
+        for host in self.hosts:
+            btn = self.buttons[host.addr]
             btn.update()
 
             if btn.just_clicked:
-                shared.server_ip = data["ip"]
+                shared.server_ip = host.data["ip"]
                 shared.next_state = State.LOBBY
-            self.buttons.append(utils.Button(data["name"], rect))
+                self.host_finder.close()
 
     def draw(self):
-        for btn in self.buttons:
+        for btn in self.buttons.values():
             btn.draw()
+
+    def cleanup(self):
+        self.host_finder.close()
@@ -7,7 +7,15 @@ import pygame
 if t.TYPE_CHECKING:
     from src.enums import State
     from src.player import CharacterData, Player
-    from src.utils import Camera, UDPClient, WorldMap
+    from src.replay import Recorder, Replayer
+    from src.utils import (
+        Camera,
+        NetworkConditions,
+        QualityController,
+        Scheduler,
+        UDPClient,
+        WorldMap,
+    )
 
 # Constants
 WORLD_GRAVITY = 70
@@ -15,6 +23,12 @@ MAX_FALL_VELOCITY = 300
 FIRE_PIT_START_Y = 700
 DISCOVERY_PORT = 5001
 GAME_PORT = 6969
+MAX_PLAYERS = 16
+MAX_LOBBY_RTT = 0.25
+PACKET_MTU = 1200
+COMPRESS_PACKETS = True
+# Maps fetched from hosts, named by their hash
+MAP_CACHE_DIR = "map_cache"
 
 # Canvas
 screen: pygame.Surface
@@ -37,15 +51,27 @@ clock: pygame.Clock
 next_state: State | None
 
 # Objects
+scheduler: Scheduler
+quality: QualityController
 player: Player
 client: UDPClient
 world_map: WorldMap
 lobby_map: WorldMap
 character_data: CharacterData
 
+# Timings
+time_to_first_frame: float | None = None
+
 # Flags
 is_window_closed = False
 is_host = False
 
+# Command line options
+net_log_path: str | None = None
+network_conditions: NetworkConditions | None = None
+recorder: Recorder | None = None
+replayer: Replayer | None = None
+show_startup_time = False
+
 # Junk
 server_ip: str
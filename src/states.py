@@ -1,16 +1,16 @@
+import functools
+import importlib
 import typing as t
+from collections import OrderedDict
+
+import pygame
 
 from src import shared, utils
 from src.chests import Chest
-from src.editor_state import EditorState
 from src.enums import State
 from src.floor import Floor, Rose, Sunflower
-from src.game_state import GameState
-from src.lobby_editor_state import LobbyEditorState
-from src.lobby_state import LobbyState
-from src.menu_state import MenuState
+from src.loading_state import LoadingState
 from src.player import ClientSpawnPoint
-from src.server_finder_state import ServerFinderState
 
 
 class StateLike(t.Protocol):
@@ -20,32 +20,121 @@ class StateLike(t.Protocol):
 
 
 class StateManager:
+    # States are imported the first time they are entered
+    STATE_PATHS: dict[State, str] = {
+        State.GAME: "src.game_state:GameState",
+        State.EDITOR: "src.editor_state:EditorState",
+        State.MENU: "src.menu_state:MenuState",
+        State.LOBBY: "src.lobby_state:LobbyState",
+        State.SERVER_FINDER: "src.server_finder_state:ServerFinderState",
+        State.LOBBY_EDITOR: "src.lobby_editor_state:LobbyEditorState",
+    }
+    # States that can't start until the maps and camera are loaded
+    WORLD_STATES = {State.GAME, State.EDITOR, State.LOBBY, State.LOBBY_EDITOR}
+    # How many suspended persistent states are kept around at once
+    MAX_POOLED_STATES = 3
+
     def __init__(self) -> None:
-        self.state_dict: dict[State, t.Type[StateLike]] = {
-            State.GAME: GameState,
-            State.EDITOR: EditorState,
-            State.MENU: MenuState,
-            State.LOBBY: LobbyState,
-            State.SERVER_FINDER: ServerFinderState,
-            State.LOBBY_EDITOR: LobbyEditorState,
-        }
-
-        shared.camera = utils.Camera(
-            bottom_bounds=shared.FIRE_PIT_START_Y
-            + utils.load_image("assets/firepit.png", True, bound=True).get_height()
-        )
+        self.state_dict: dict[State, t.Type[StateLike]] = {}
+        self.state_pool: OrderedDict[State, StateLike] = OrderedDict()
+        self.current_state: State | None = None
 
-        entities = [Floor, ClientSpawnPoint, Rose, Sunflower, Chest]
-        shared.world_map = utils.WorldMap("assets/map.json", entities)
-        shared.lobby_map = utils.WorldMap("assets/lobby_map.json", entities)
+        self.world_loader = utils.BackgroundLoader(
+            [
+                ("camera", self.read_camera_bounds, self.load_camera),
+                (
+                    "game map",
+                    functools.partial(utils.WorldMap.read, "assets/map.json"),
+                    self.load_world_map,
+                ),
+                (
+                    "lobby map",
+                    functools.partial(utils.WorldMap.read, "assets/lobby_map.json"),
+                    self.load_lobby_map,
+                ),
+            ]
+        )
+        self.world_loader.start()
 
         shared.next_state = State.MENU
         self.set_state()
 
+    def read_camera_bounds(self) -> float:
+        # Only decoded, which unlike converting is fine off the main thread
+        firepit = pygame.image.load(utils.get_asset_path("assets/firepit.png"))
+        return shared.FIRE_PIT_START_Y + firepit.get_bounding_rect().height
+
+    def load_camera(self, bottom_bounds: float):
+        shared.camera = utils.Camera(bottom_bounds=bottom_bounds)
+
+    def get_map_entities(self) -> list[t.Type]:
+        return [Floor, ClientSpawnPoint, Rose, Sunflower, Chest]
+
+    def load_world_map(self, contents: tuple[bytes, list]):
+        shared.world_map = utils.WorldMap(
+            "assets/map.json", self.get_map_entities(), contents
+        )
+
+    def load_lobby_map(self, contents: tuple[bytes, list]):
+        shared.lobby_map = utils.WorldMap(
+            "assets/lobby_map.json", self.get_map_entities(), contents
+        )
+
+    def get_state_class(self, state: State) -> t.Type[StateLike]:
+        cls = self.state_dict.get(state)
+        if cls is None:
+            module_name, class_name = StateManager.STATE_PATHS[state].split(":")
+            cls = getattr(importlib.import_module(module_name), class_name)
+            self.state_dict[state] = cls
+        return cls
+
     def set_state(self):
-        self.state_obj: StateLike = self.state_dict[shared.next_state]()  # type: ignore HEHHEHE
+        state = shared.next_state
         shared.next_state = None
 
+        if state in StateManager.WORLD_STATES:
+            # Replays wait for loading in place, so frames line up with the recording
+            if not self.world_loader.is_done and shared.replayer is None:
+                self.leave_current_state()
+                self.state_obj = LoadingState(self.world_loader, state)
+                return
+            self.world_loader.wait()
+
+        self.leave_current_state()
+        self.current_state = state
+
+        pooled = self.state_pool.pop(state, None)
+        if pooled is not None:
+            if not hasattr(pooled, "can_resume") or pooled.can_resume():  # type: ignore
+                self.state_obj = pooled
+                if hasattr(pooled, "resume"):
+                    pooled.resume()  # type: ignore
+                return
+            self.release(pooled)
+
+        self.state_obj = self.get_state_class(state)()  # type: ignore HEHHEHE
+
+    def leave_current_state(self):
+        """Suspends persistent states into the pool and releases the rest"""
+
+        if not hasattr(self, "state_obj"):
+            return
+
+        if not getattr(self.state_obj, "persistent", False):
+            self.release(self.state_obj)
+            return
+
+        if hasattr(self.state_obj, "suspend"):
+            self.state_obj.suspend()  # type: ignore
+        self.state_pool[self.current_state] = self.state_obj  # type: ignore
+        while len(self.state_pool) > StateManager.MAX_POOLED_STATES:
+            _, evicted = self.state_pool.popitem(last=False)
+            self.release(evicted)
+
+    def release(self, state_obj: StateLike):
+        if hasattr(state_obj, "cleanup"):
+            state_obj.cleanup()  # type: ignore
+
     def update(self):
         self.state_obj.update()
         if shared.next_state is not None:
@@ -55,5 +144,6 @@ class StateManager:
         self.state_obj.draw()
 
     def cleanup(self):
-        if hasattr(self.state_obj, "cleanup"):
-            self.state_obj.cleanup()  # type: ignore
+        self.release(self.state_obj)
+        while self.state_pool:
+            self.release(self.state_pool.popitem()[1])
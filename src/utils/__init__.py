@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import functools
 import itertools
+import math
 import os
 import sys
+import threading
 import time
 import typing as t
 from collections import defaultdict
@@ -16,8 +18,19 @@ import ujson
 
 from src import shared
 
-from .client import LocalBroadcastClient, UDPClient
+from .cache import SurfaceCache
+from .client import DiscoveredHost, LocalBroadcastClient, UDPClient
+from .lighting import Light, LightMap, make_light_sprite
+from .mapsync import MapCache, MapDownload, hash_map, is_map_hash, pack_map_chunks
+from .navigation import NavBody, NavEdge, NavGraph, get_nav_cache_path
+from .netem import NetworkConditioner, NetworkConditions
+from .netstats import NetStats
+from .packets import PacketPacker, Reassembler
+from .particles import ParticleSystem, make_glow_sprites
+from .quality import QUALITY_LEVELS, QualityController, QualitySettings
+from .scheduler import ScheduledCall, Scheduler
 from .server import LocalBroadcastServer, UDPServer
+from .spatial import RayHit, SpatialGrid
 
 
 class Button:
@@ -160,9 +173,132 @@ class ItemSelector:
             )
 
 
+class NetStatsOverlay:
+    """Draws a summary of one or more `NetStats` in the corner of the screen"""
+
+    PADDING = 10
+
+    def __init__(self, stats: list[NetStats], refresh_time: float = 0.5) -> None:
+        self.stats = stats
+        self.font = load_font(None, 20)
+        self.is_visible = False
+        self.surfs: list[pygame.Surface] = []
+        self.refresh_call = shared.scheduler.call_every(refresh_time, self.refresh)
+
+    def close(self):
+        self.refresh_call.cancel()
+
+    def get_lines(self) -> list[str]:
+        lines = []
+        for stats in self.stats:
+            snapshot = stats.snapshot()
+            rtt = snapshot["rtt"]
+            sequence = snapshot["sequence"]
+            lines.append(
+                f"{snapshot['name']}: "
+                f"in {snapshot['packets_in_per_sec']:.0f} pkt/s "
+                f"{snapshot['bytes_in_per_sec'] / 1024:.1f} KiB/s | "
+                f"out {snapshot['packets_out_per_sec']:.0f} pkt/s "
+                f"{snapshot['bytes_out_per_sec'] / 1024:.1f} KiB/s"
+            )
+            if rtt["count"]:
+                lines.append(
+                    f"  rtt p50 {rtt['p50'] * 1000:.1f} ms "
+                    f"p95 {rtt['p95'] * 1000:.1f} ms"
+                )
+            lines.append(f"  lost {sequence['lost']} reordered {sequence['reordered']}")
+            for peer, peer_stats in snapshot["peers"].items():
+                lines.append(
+                    f"  {peer}: {peer_stats['packets_in_per_sec']:.0f} pkt/s "
+                    f"lost {peer_stats['lost']}"
+                )
+        return lines
+
+    def refresh(self):
+        if not self.is_visible:
+            return
+        self.surfs = [
+            self.font.render(line, True, "white") for line in self.get_lines()
+        ]
+
+    def update(self):
+        if shared.kp[pygame.K_F3]:
+            self.is_visible = not self.is_visible
+            self.refresh()
+
+    def draw(self):
+        if not self.is_visible:
+            return
+
+        y = NetStatsOverlay.PADDING
+        for surf in self.surfs:
+            shared.screen.blit(
+                surf,
+                (shared.srect.width - surf.get_width() - NetStatsOverlay.PADDING, y),
+            )
+            y += surf.get_height()
+
+
+class SpriteTransformCache:
+    """
+    Rotated and flipped versions of images, rendered once per quantized
+    angle and kept in an LRU bounded by their total size in bytes.
+
+    Frames are keyed by whatever identifies the source image, so callers
+    sharing a look (like an outfit) share the frames too.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, angle_step: float = 5.0):
+        self.angle_step = angle_step
+        self.n_steps = round(360 / angle_step)
+        self.frames = SurfaceCache(max_bytes)
+
+    def get(
+        self, key, image: pygame.Surface, angle: float = 0.0, flip_x: bool = False
+    ) -> pygame.Surface:
+        """`image` turned by the nearest step to `angle` degrees and flipped"""
+
+        step = round(angle / self.angle_step) % self.n_steps
+        if not step and not flip_x:
+            return image
+
+        frame_key = (key, step, flip_x)
+        frame = self.frames.get(frame_key)
+        if frame is None:
+            frame = self.render(image, step, flip_x)
+            self.frames.put(frame_key, frame)
+        return frame
+
+    def render(self, image: pygame.Surface, step: int, flip_x: bool) -> pygame.Surface:
+        if flip_x:
+            image = pygame.transform.flip(image, True, False)
+        if step:
+            image = pygame.transform.rotate(image, step * self.angle_step)
+        return image
+
+    def prerender(
+        self,
+        key,
+        image: pygame.Surface,
+        angles: t.Iterable[float],
+        flips: t.Iterable[bool] = (False, True),
+    ):
+        """Renders the given frames ahead of time, so drawing them never has to"""
+
+        for flip_x in flips:
+            for angle in angles:
+                self.get(key, image, angle, flip_x)
+
+    def clear(self):
+        self.frames.clear()
+
+
 class MapItem:
     """Placeholder for the real entities"""
 
+    # Maps can hold thousands of these, so they skip the per-instance dict
+    __slots__ = ("pos", "image", "rect", "entity_type")
+
     def __init__(self, pos, entity_type, image) -> None:
         self.pos = pygame.Vector2(pos)
         self.image = image
@@ -170,14 +306,35 @@ class MapItem:
         self.entity_type = entity_type
 
     def draw(self):
-        shared.screen.blit(self.image, shared.camera.transform(self.pos))
+        shared.camera.blit(self.image, self.pos)
 
 
 class WorldMap:
-    """The entire world, categorized in a map."""
+    """
+    The entire world, categorized in a map.
+
+    Items are drawn through chunks: square areas of the world baked into
+    one surface per zoom level, built when first seen and evicted LRU.
+    Adding an item only rebakes the chunks it touches.
+    """
+
+    CHUNK_SIZE = 512
+    CHUNK_CACHE_BYTES = 64 * 1024 * 1024
 
-    def __init__(self, file_path: str | Path, entity_classes: list[t.Type]) -> None:
-        # self.chunks: dict[tuple[int, int], list[WorldEntity]] = {}
+    def __init__(
+        self,
+        file_path: str | Path,
+        entity_classes: list[t.Type],
+        contents: tuple[bytes, list] | None = None,
+    ) -> None:
+        # Which items touch which chunk, keyed by chunk coordinates
+        self.grid = SpatialGrid(WorldMap.CHUNK_SIZE)
+        # Baked chunks, keyed by (chunk x, chunk y, zoom)
+        self.chunks = SurfaceCache(WorldMap.CHUNK_CACHE_BYTES)
+        # Draw order of the items, so baking keeps later ones on top
+        self._order: dict[MapItem, int] = {}
+        # Built on first use, one per kind of body, see `get_nav_graph`
+        self.nav_graphs: dict[NavBody, NavGraph] = {}
 
         self.file_path = file_path
         self.entity_classes = entity_classes
@@ -185,27 +342,107 @@ class WorldMap:
             entity_type.__name__: entity_type for entity_type in self.entity_classes
         }
 
-        self.load_map_items()
+        self.load_map_items(contents)
+
+    @staticmethod
+    def read(file_path: str | Path) -> tuple[bytes, list]:
+        """
+        The raw bytes of a map file and the items parsed from them. Touches
+        no surfaces, so it's safe to run off the main thread.
+        """
+
+        raw = Path(file_path).read_bytes()
+        return raw, ujson.loads(raw)
+
+    def load_map_items(self, contents: tuple[bytes, list] | None = None):
+        """Makes the items from `contents`, or from the file if not given"""
 
-    def load_map_items(self):
         self.entities: list[MapItem] = []
+        # The index is only needed by the editor, so it is built on first use
+        self._is_indexed = False
 
-        with open(self.file_path) as f:
-            schema = ujson.load(f)
+        raw, schema = WorldMap.read(self.file_path) if contents is None else contents
+        self.hash = hash_map(raw)
 
         for class_name, position in schema:
             cls = self.reverse_entity_class_map[class_name]
             image = cls.get_placeholder_img()
             self.entities.append(MapItem(position, cls, image))
 
+    def read_raw(self) -> bytes:
+        with open(self.file_path, "rb") as f:
+            return f.read()
+
+    def build_index(self):
+        if self._is_indexed:
+            return
+
+        self.grid.clear()
+        self.chunks.clear()
+        self._order.clear()
+        for item in self.entities:
+            self._order[item] = len(self._order)
+            self.grid.insert(item, *item.rect)
+        self._is_indexed = True
+
+    def add_item(self, item: MapItem):
+        """Adds an item and drops the baked chunks it shows up in"""
+
+        self.build_index()
+        self.entities.append(item)
+        self._order[item] = len(self._order)
+        self.grid.insert(item, *item.rect)
+        left, top, right, bottom = self.grid.get_cell_range(*item.rect)
+        self.chunks.remove_if(
+            lambda key: left <= key[0] <= right and top <= key[1] <= bottom
+        )
+        if item.entity_type.__name__ == "Floor":
+            for nav_graph in self.nav_graphs.values():
+                nav_graph.add_floor(tuple(item.rect))
+
+    def get_items_at(self, rect) -> list[MapItem]:
+        """Items whose rects overlap `rect`, not counting touching edges"""
+
+        self.build_index()
+        return [item for item in self.grid.query(*rect) if item.rect.colliderect(rect)]
+
+    def get_floors(self) -> list[tuple[int, int, int, int]]:
+        return [
+            tuple(item.rect)
+            for item in self.entities
+            if item.entity_type.__name__ == "Floor"
+        ]
+
+    def get_nav_graph(self, body: NavBody) -> NavGraph:
+        """
+        Where `body` can get to on the map. Loaded from beside the map file
+        when cached there, otherwise built and cached on first use, then
+        kept up to date as floors are added.
+        """
+
+        nav_graph = self.nav_graphs.get(body)
+        if nav_graph is None:
+            nav_graph = self.nav_graphs[body] = NavGraph.load_or_build(
+                self.get_floors(),
+                body,
+                get_nav_cache_path(self.file_path),
+                self.hash,
+            )
+        return nav_graph
+
     def dump(self) -> None:
         jsonable_map = [
             [entity.entity_type.__name__, (entity.pos.x, entity.pos.y)]
             for entity in self.entities
         ]
 
-        with open(self.file_path, "w") as f:
-            ujson.dump(jsonable_map, f, indent=2)
+        raw = ujson.dumps(jsonable_map, indent=2).encode()
+        with open(self.file_path, "wb") as f:
+            f.write(raw)
+        self.hash = hash_map(raw)
+        # Already up to date with the edits, so the next load can skip building
+        for nav_graph in self.nav_graphs.values():
+            nav_graph.save(get_nav_cache_path(self.file_path), self.hash)
 
     def load(self) -> list:
         entities = []
@@ -217,9 +454,123 @@ class WorldMap:
 
         return entities
 
+    def bake_chunk(self, cx: int, cy: int, zoom: float) -> pygame.Surface:
+        """
+        Renders every item touching the chunk. Positions are rounded in
+        zoomed pixels, so neighbouring chunks line up without seams.
+        """
+
+        size = WorldMap.CHUNK_SIZE
+        left = math.floor(cx * size * zoom)
+        top = math.floor(cy * size * zoom)
+        width = math.floor((cx + 1) * size * zoom) - left
+        height = math.floor((cy + 1) * size * zoom) - top
+        surf = pygame.Surface((width, height), pygame.SRCALPHA)
+
+        items = sorted(self.grid.cells.get((cx, cy), ()), key=self._order.__getitem__)
+        surf.fblits(
+            [
+                (
+                    shared.camera.scale(item.image, zoom),
+                    (round(item.pos.x * zoom) - left, round(item.pos.y * zoom) - top),
+                )
+                for item in items
+            ]
+        )
+        return surf
+
     def draw(self):
-        for entity in self.entities:
-            entity.draw()
+        self.build_index()
+        camera = shared.camera
+        zoom = camera.zoom
+        size = WorldMap.CHUNK_SIZE
+        view_width, view_height = camera.view_size
+        left, top, right, bottom = self.grid.get_cell_range(
+            camera.offset.x, camera.offset.y, view_width, view_height
+        )
+        offset_x = round(camera.offset.x * zoom)
+        offset_y = round(camera.offset.y * zoom)
+
+        blits = []
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                if (cx, cy) not in self.grid.cells:
+                    continue
+                key = (cx, cy, zoom)
+                chunk = self.chunks.get(key)
+                if chunk is None:
+                    chunk = self.bake_chunk(cx, cy, zoom)
+                    self.chunks.put(key, chunk)
+                blits.append(
+                    (
+                        chunk,
+                        (
+                            math.floor(cx * size * zoom) - offset_x,
+                            math.floor(cy * size * zoom) - offset_y,
+                        ),
+                    )
+                )
+        shared.screen.fblits(blits)
+
+
+class BackgroundLoader:
+    """
+    Runs a list of named loading jobs on a worker thread and tracks progress.
+
+    Each job is a `(name, read, finish)` triple. `read` runs on the worker
+    and should only read and parse files, since surfaces can't be converted
+    off the main thread. `wait` then hands what it returned to `finish`, on
+    whichever thread called it.
+    """
+
+    def __init__(
+        self, jobs: list[tuple[str, t.Callable[[], t.Any], t.Callable[[t.Any], None]]]
+    ) -> None:
+        self.jobs = jobs
+        self.n_done = 0
+        self.current_job = ""
+        self.error: BaseException | None = None
+        self.done_event = threading.Event()
+        self.results: list = []
+        self.is_finished = False
+
+    @property
+    def progress(self) -> float:
+        return self.n_done / len(self.jobs) if self.jobs else 1.0
+
+    @property
+    def is_done(self) -> bool:
+        return self.done_event.is_set()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        try:
+            for name, read, _ in self.jobs:
+                self.current_job = name
+                self.results.append(read())
+                self.n_done += 1
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done_event.set()
+
+    def wait(self):
+        """
+        Blocks until everything is read, re-raising any loading error, then
+        finishes the jobs the first time it's called
+        """
+
+        self.done_event.wait()
+        if self.error is not None:
+            raise self.error
+        if self.is_finished:
+            return
+
+        self.is_finished = True
+        for (_, _, finish), result in zip(self.jobs, self.results):
+            finish(result)
 
 
 class PlacementMode(Enum):
@@ -328,16 +679,15 @@ class WorldPlacementHandler:
         if not shared.mouse_press[0] or self._out_of_bounds:
             return
 
-        for item in self.world_map.entities:
-            if self.crect.colliderect(item.rect):
-                return
+        if self.world_map.get_items_at(self.crect):
+            return
 
         if self.mode == PlacementMode.FREE:
             self._last_free_placement = self.current_entity_pos.copy()
         self._last_placed_pos = pygame.Vector2(
             self.current_entity_image.get_rect(topleft=self.current_entity_pos).center
         )
-        self.world_map.entities.append(
+        self.world_map.add_item(
             MapItem(
                 self.current_entity_pos,
                 self.current_entity_type,
@@ -394,7 +744,7 @@ class WorldPlacementHandler:
                     class_name
                 ]
 
-        self.current_entity_pos = shared.mouse_pos + shared.camera.offset
+        self.current_entity_pos = shared.camera.screen_to_world(shared.mouse_pos)
 
         self._out_of_bounds = False
         offset = self.current_entity_pos
@@ -414,7 +764,7 @@ class WorldPlacementHandler:
                 self._out_of_bounds = True
 
         if self.mode == PlacementMode.GRID:
-            self.current_entity_pos = shared.mouse_pos + shared.camera.offset
+            self.current_entity_pos = shared.camera.screen_to_world(shared.mouse_pos)
             width, height = self.current_entity_image.get_size()
             self.current_entity_pos.x //= width
             self.current_entity_pos.y //= height
@@ -429,14 +779,14 @@ class WorldPlacementHandler:
 
     def draw(self):
         if not self.command_bar._command_being_typed and not self._out_of_bounds:
-            shared.screen.blit(
-                self.current_entity_image,
-                shared.camera.transform(self.current_entity_pos),
-            )
+            shared.camera.blit(self.current_entity_image, self.current_entity_pos)
         self.command_bar.draw()
 
 
 class Camera:
+    # Discrete so scaled images and baked chunks can be reused between frames
+    ZOOM_LEVELS = (0.125, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0)
+
     def __init__(
         self,
         left_bounds: float | None = None,
@@ -449,39 +799,122 @@ class Camera:
         self.right_bounds = right_bounds
         self.top_bounds = top_bounds
         self.bottom_bounds = bottom_bounds
+        # World position of the top left of the screen
         self.offset = pygame.Vector2()
+        self.zoom = 1.0
+        # Images scaled to a zoom level, keyed by (image, zoom)
+        self.scaled_images = SurfaceCache(32 * 1024 * 1024)
+        # Reused by `transform` so drawing a rect doesn't allocate one
+        self._screen_rect = pygame.FRect()
+
+    @property
+    def view_size(self) -> tuple[float, float]:
+        """How much of the world fits on screen, in world units"""
+
+        return shared.srect.width / self.zoom, shared.srect.height / self.zoom
+
+    def set_zoom(self, zoom: float, anchor=None):
+        """
+        Changes the zoom, keeping the world point under `anchor` (a screen
+        position, the screen centre by default) where it is
+        """
+
+        if anchor is None:
+            anchor = shared.srect.center
+        world_anchor = self.screen_to_world(anchor)
+        self.zoom = zoom
+        self.offset.update(
+            world_anchor.x - anchor[0] / zoom, world_anchor.y - anchor[1] / zoom
+        )
+
+    def step_zoom(self, steps: int, anchor=None):
+        """Moves `steps` levels along ZOOM_LEVELS, positive zooming in"""
+
+        levels = Camera.ZOOM_LEVELS
+        nearest = min(range(len(levels)), key=lambda i: abs(levels[i] - self.zoom))
+        index = max(0, min(nearest + steps, len(levels) - 1))
+        self.set_zoom(levels[index], anchor)
+
+    def screen_to_world(self, pos) -> pygame.Vector2:
+        return pygame.Vector2(
+            pos[0] / self.zoom + self.offset.x, pos[1] / self.zoom + self.offset.y
+        )
 
     def attach_to(self, pos, smoothness_factor=0.08):
+        if not shared.quality.settings.camera_smoothing:
+            smoothness_factor = 1
+
+        view_width, view_height = self.view_size
         self.offset.x += (
-            pos[0] - self.offset.x - (shared.srect.width // 2)
+            pos[0] - self.offset.x - (view_width // 2)
         ) * smoothness_factor
         self.offset.y += (
-            pos[1] - self.offset.y - (shared.srect.height // 2)
+            pos[1] - self.offset.y - (view_height // 2)
         ) * smoothness_factor
 
     def bound(self):
         offset = self.offset
+        view_width, view_height = self.view_size
 
         if self.left_bounds is not None:
             if offset.x < self.left_bounds:
                 offset.x = self.left_bounds
 
         if self.right_bounds is not None:
-            if offset.x > self.right_bounds - shared.srect.width:
-                offset.x = self.right_bounds - shared.srect.width
+            if offset.x > self.right_bounds - view_width:
+                offset.x = self.right_bounds - view_width
 
         if self.top_bounds is not None:
             if offset.y < self.top_bounds:
                 offset.y = self.top_bounds
 
         if self.bottom_bounds is not None:
-            if offset.y > self.bottom_bounds - shared.srect.height:
-                offset.y = self.bottom_bounds - shared.srect.height
+            if offset.y > self.bottom_bounds - view_height:
+                offset.y = self.bottom_bounds - view_height
+
+    def transform(self, pos) -> tuple[float, float] | pygame.FRect:
+        """
+        Converts world coordinates to screen coordinates.
+
+        Rects come back as a rect owned by the camera, which is only valid
+        until the next call. Blit or draw with it straight away.
+        """
+
+        offset = self.offset
+        zoom = self.zoom
+        if isinstance(pos, (pygame.Rect, pygame.FRect)):
+            screen_rect = self._screen_rect
+            screen_rect.update(
+                (pos[0] - offset.x) * zoom,
+                (pos[1] - offset.y) * zoom,
+                pos[2] * zoom,
+                pos[3] * zoom,
+            )
+            return screen_rect
+        return ((pos[0] - offset.x) * zoom, (pos[1] - offset.y) * zoom)
+
+    def scale(self, image: pygame.Surface, zoom: float | None = None) -> pygame.Surface:
+        """`image` at the current zoom, scaled once per zoom level and cached"""
+
+        if zoom is None:
+            zoom = self.zoom
+        if zoom == 1:
+            return image
+
+        key = (image, zoom)
+        scaled = self.scaled_images.get(key)
+        if scaled is None:
+            width, height = image.get_size()
+            scaled = pygame.transform.scale(
+                image, (max(1, round(width * zoom)), max(1, round(height * zoom)))
+            )
+            self.scaled_images.put(key, scaled)
+        return scaled
+
+    def blit(self, image: pygame.Surface, pos):
+        """Draws `image` with its top left at the world position `pos`"""
 
-    def transform(self, pos) -> pygame.Vector2 | pygame.Rect | pygame.FRect:
-        if isinstance(pos, pygame.Rect) or isinstance(pos, pygame.FRect):
-            return pos.move(*-self.offset)
-        return pygame.Vector2(pos[0] - self.offset.x, pos[1] - self.offset.y)
+        shared.screen.blit(self.scale(image), self.transform(pos))
 
 
 def get_asset_path(path):
@@ -545,18 +978,83 @@ class CollisionData:
 class Collider:
     """Have as attribute to entity"""
 
+    __slots__ = ("pos", "size", "_rect", "_rect_key", "support", "_rest_key")
+
     all_colliders: list[t.Self] = []
     temp_colliders: list[t.Self] = []
+    # Ray and area queries over both lists, see `CollisionWorld`
+    world: CollisionWorld
+    # How close a dynamic body has to come to wake a resting one
+    WAKE_MARGIN = 4
 
     def __init__(self, pos, size, temp: bool = False) -> None:
         self.pos = pygame.Vector2(pos)
         self.size = size
+        self._rect = pygame.FRect(self.pos, self.size)
+        self._rect_key = (self.pos.x, self.pos.y, self.size)
+        # What we are resting on while asleep, see `sleep_on`
+        self.support: Collider | None = None
+        self._rest_key = None
         if not temp:
             Collider.all_colliders.append(self)
 
     @property
     def rect(self) -> pygame.FRect:
-        return pygame.FRect(self.pos, self.size)
+        """
+        Cached rect, refreshed only when `pos` or `size` changed since the
+        last access. Shared between callers, so don't modify it.
+        """
+
+        pos = self.pos
+        key = self._rect_key
+        if key[0] != pos.x or key[1] != pos.y or key[2] is not self.size:
+            self._rect.update(pos, self.size)
+            self._rect_key = (pos.x, pos.y, self.size)
+        return self._rect
+
+    def move_to(self, pos, size=None):
+        """Moves the collider in place, for reusing one instead of making another"""
+
+        self.pos.update(pos)
+        if size is not None:
+            self.size = size
+
+    @property
+    def is_sleeping(self) -> bool:
+        return self.support is not None
+
+    def sleep_on(self, support: t.Self) -> bool:
+        """
+        Rests on `support`, so the owner can skip moving us until
+        `can_keep_sleeping` says otherwise. Dynamic bodies in
+        `temp_colliders` can move at any time, so we never rest on them.
+        """
+
+        if support in Collider.temp_colliders:
+            return False
+        self.support = support
+        self._rest_key = (tuple(self.rect), tuple(support.rect))
+        return True
+
+    def wake(self):
+        self.support = None
+        self._rest_key = None
+
+    def can_keep_sleeping(self) -> bool:
+        """
+        Whether moving us would still end where we are. Not when we or our
+        support have been moved, or when a dynamic body came close enough
+        that it could land in our way.
+        """
+
+        if self.support is None:
+            return False
+        if self._rest_key != (tuple(self.rect), tuple(self.support.rect)):
+            return False
+
+        margin = Collider.WAKE_MARGIN
+        area = self.rect.inflate(margin * 2, margin * 2)
+        return area.collidelist(Collider.temp_colliders) == -1
 
     def get_collision_data(self, dx, dy) -> CollisionData:
         """Returns datapacket containing collisiondata"""
@@ -565,23 +1063,29 @@ class Collider:
         possible_x = []
         possible_y = []
 
-        for collider in Collider.all_colliders + Collider.temp_colliders:
+        # Our position only changes after the loop, so both probes are built once
+        rect_x = self.rect.move(dx, 0)
+        rect_y = self.rect.move(0, dy)
+        for collider in itertools.chain(
+            Collider.all_colliders, Collider.temp_colliders
+        ):
             if collider is self:
                 continue
 
-            is_colliding_x = self.rect.move(dx, 0).colliderect(collider.rect)
-            is_colliding_y = self.rect.move(0, dy).colliderect(collider.rect)
+            collider_rect = collider.rect
+            is_colliding_x = rect_x.colliderect(collider_rect)
+            is_colliding_y = rect_y.colliderect(collider_rect)
 
             side = None
             if is_colliding_x and dx < 0:
-                possible_x.append(collider.rect.right)
+                possible_x.append(collider_rect.right)
                 side = CollisionSide.LEFT
             elif is_colliding_x and dx > 0:
                 possible_x.append(collider.pos.x - self.size[0])
                 side = CollisionSide.RIGHT
 
             if is_colliding_y and dy < 0:
-                possible_y.append(collider.rect.bottom)
+                possible_y.append(collider_rect.bottom)
                 side = CollisionSide.TOP
             elif is_colliding_y and dy > 0:
                 possible_y.append(collider.pos.y - self.size[1])
@@ -623,6 +1127,157 @@ class Collider:
         )
 
 
+class CollisionWorld:
+    """
+    Ray, segment and area queries against every collider, the static
+    `all_colliders` and the per-frame `temp_colliders` alike.
+
+    Colliders are mirrored into a `SpatialGrid`, which is brought up to date
+    by the first query after `invalidate`. Core invalidates it every frame,
+    so all the queries made in a frame share one sync.
+    """
+
+    CELL_SIZE = 128
+    MAX_RAY_DISTANCE = 5000.0
+
+    def __init__(self, cell_size: float = CELL_SIZE) -> None:
+        self.grid = SpatialGrid(cell_size)
+        self.is_synced = False
+
+    def invalidate(self):
+        self.is_synced = False
+
+    def sync(self):
+        grid = self.grid
+        present = set()
+        for collider in itertools.chain(
+            Collider.all_colliders, Collider.temp_colliders
+        ):
+            present.add(collider)
+            rect = (collider.pos.x, collider.pos.y, *collider.size)
+            if grid.rects.get(collider) != rect:
+                grid.insert(collider, *rect)
+
+        for collider in grid.rects.keys() - present:
+            grid.remove(collider)
+        self.is_synced = True
+
+    def _get_grid(self) -> SpatialGrid:
+        if not self.is_synced:
+            self.sync()
+        return self.grid
+
+    def raycast_all(
+        self,
+        origin,
+        direction,
+        max_distance: float = MAX_RAY_DISTANCE,
+        ignore: t.Iterable[Collider] = (),
+    ) -> list[RayHit]:
+        """Every collider the ray passes through, nearest first"""
+
+        return self._get_grid().raycast(
+            origin[0],
+            origin[1],
+            direction[0],
+            direction[1],
+            max_distance,
+            frozenset(ignore),
+        )
+
+    def raycast(
+        self,
+        origin,
+        direction,
+        max_distance: float = MAX_RAY_DISTANCE,
+        ignore: t.Iterable[Collider] = (),
+    ) -> RayHit | None:
+        """The first collider the ray hits, if any"""
+
+        hits = self._get_grid().raycast(
+            origin[0],
+            origin[1],
+            direction[0],
+            direction[1],
+            max_distance,
+            frozenset(ignore),
+            first_only=True,
+        )
+        return hits[0] if hits else None
+
+    def segment_cast_all(
+        self, start, end, ignore: t.Iterable[Collider] = ()
+    ) -> list[RayHit]:
+        direction = (end[0] - start[0], end[1] - start[1])
+        return self.raycast_all(start, direction, math.hypot(*direction), ignore)
+
+    def segment_cast(
+        self, start, end, ignore: t.Iterable[Collider] = ()
+    ) -> RayHit | None:
+        direction = (end[0] - start[0], end[1] - start[1])
+        return self.raycast(start, direction, math.hypot(*direction), ignore)
+
+    def overlap(self, rect, ignore: t.Iterable[Collider] = ()) -> list[RayHit]:
+        """
+        Colliders overlapping `rect`, nearest centre first. Each hit's `point`
+        is the centre of the overlapping area and its `distance` is measured
+        between the centres.
+        """
+
+        x, y, w, h = rect
+        center_x, center_y = x + w / 2, y + h / 2
+        ignored = frozenset(ignore)
+
+        hits = []
+        for collider in self._get_grid().query(x, y, w, h):
+            if collider in ignored:
+                continue
+            cx, cy = collider.pos
+            cw, ch = collider.size
+            left, right = max(x, cx), min(x + w, cx + cw)
+            top, bottom = max(y, cy), min(y + h, cy + ch)
+            hits.append(
+                RayHit(
+                    collider,
+                    math.hypot(cx + cw / 2 - center_x, cy + ch / 2 - center_y),
+                    ((left + right) / 2, (top + bottom) / 2),
+                    (0.0, 0.0),
+                )
+            )
+
+        hits.sort(key=lambda hit: hit.distance)
+        return hits
+
+
+Collider.world = CollisionWorld()
+
+
+class WorldSnapshot:
+    """
+    Saves and restores the global lists a state fills with its world, along
+    with the camera position and zoom, so a suspended state can pick up where
+    it left off
+    """
+
+    def __init__(self, *extra_lists: list) -> None:
+        self.lists = [Collider.all_colliders, Collider.temp_colliders, *extra_lists]
+        self.saved_lists: list[list] = []
+        self.camera_offset = pygame.Vector2()
+        self.camera_zoom = 1.0
+
+    def save(self):
+        self.saved_lists = [list(items) for items in self.lists]
+        self.camera_offset = shared.camera.offset.copy()
+        self.camera_zoom = shared.camera.zoom
+
+    def restore(self):
+        for items, saved in zip(self.lists, self.saved_lists):
+            items[:] = saved
+        Collider.world.invalidate()
+        shared.camera.offset.update(self.camera_offset)
+        shared.camera.zoom = self.camera_zoom
+
+
 class Timer:
     """
     Class to check if time has passed.
@@ -0,0 +1,51 @@
+import typing as t
+from collections import OrderedDict
+
+import pygame
+
+
+class SurfaceCache:
+    """LRU of rendered surfaces, bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.surfs: OrderedDict[t.Hashable, pygame.Surface] = OrderedDict()
+        self.n_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.surfs)
+
+    def __contains__(self, key) -> bool:
+        return key in self.surfs
+
+    @staticmethod
+    def get_size(surf: pygame.Surface) -> int:
+        return surf.get_width() * surf.get_height() * surf.get_bytesize()
+
+    def get(self, key) -> pygame.Surface | None:
+        surf = self.surfs.get(key)
+        if surf is not None:
+            self.surfs.move_to_end(key)
+        return surf
+
+    def put(self, key, surf: pygame.Surface):
+        self.remove(key)
+        self.surfs[key] = surf
+        self.n_bytes += self.get_size(surf)
+        # The newest surface always stays, even when it's over budget alone
+        while self.n_bytes > self.max_bytes and len(self.surfs) > 1:
+            _, evicted = self.surfs.popitem(last=False)
+            self.n_bytes -= self.get_size(evicted)
+
+    def remove(self, key):
+        surf = self.surfs.pop(key, None)
+        if surf is not None:
+            self.n_bytes -= self.get_size(surf)
+
+    def remove_if(self, predicate: t.Callable[[t.Hashable], bool]):
+        for key in [key for key in self.surfs if predicate(key)]:
+            self.remove(key)
+
+    def clear(self):
+        self.surfs.clear()
+        self.n_bytes = 0
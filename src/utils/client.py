@@ -1,16 +1,48 @@
 import socket
 import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import ujson
+
+from .mapsync import MAX_MAP_CHUNKS, MapDownload, is_map_hash
+from .netstats import NetStats
+from .packets import RECV_SIZE, PacketPacker, Reassembler, tune_socket
+
+
+@dataclass
+class DiscoveredHost:
+    """A host that replied to a discovery probe"""
+
+    addr: tuple[str, int]
+    data: dict
+    raw: bytes
+    last_seen: float
+    rtt: float | None = None
 
 
 class LocalBroadcastClient:
     """Receive some data from devices connected on the same network"""
 
+    PROBE_INTERVAL = 2.0
+    HOST_TTL = 6.0
+    # Weight given to the newest RTT sample when smoothing
+    RTT_SMOOTHING = 0.3
+    # Probes older than this many are forgotten and their replies ignored
+    MAX_PENDING_PROBES = 8
+
     def __init__(self, discovery_port: int) -> None:
         self.port = discovery_port
         self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.client.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        self.received_data: list[bytes] = []
+        self.client.settimeout(LocalBroadcastClient.PROBE_INTERVAL)
+        self.hosts: dict[tuple[str, int], DiscoveredHost] = {}
+        self.hosts_lock = threading.Lock()
         self.is_receiving = False
+        self._last_probe = 0.0
+        self._probe_id = 0
+        self._probe_send_times: dict[str, float] = {}
 
     def start_receiving(self):
         self.is_receiving = True
@@ -20,31 +52,346 @@ class LocalBroadcastClient:
         self.is_receiving = False
         self.client.close()
 
-    def receive(self):
-        self.client.sendto("DISCOVER".encode(), ("255.255.255.255", self.port))
+    def probe(self):
+        self._probe_id += 1
+        probe_id = str(self._probe_id)
+        self._probe_send_times[probe_id] = time.perf_counter()
+        self._probe_send_times.pop(
+            str(self._probe_id - LocalBroadcastClient.MAX_PENDING_PROBES), None
+        )
 
+        self.client.sendto(
+            f"DISCOVER {probe_id}".encode(), ("255.255.255.255", self.port)
+        )
+        self._last_probe = time.perf_counter()
+
+    def receive(self):
         while self.is_receiving:
-            response, _ = self.client.recvfrom(1024)
-            self.received_data.append(response)
+            if time.perf_counter() - self._last_probe > self.PROBE_INTERVAL:
+                self.probe()
+
+            try:
+                response, addr = self.client.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            self.on_response(response, addr)
+
+    def on_response(self, response: bytes, addr: tuple[str, int]):
+        """Registers a reply, only parsing it if it differs from the last one"""
+
+        now = time.perf_counter()
+        # The echoed probe id comes on its own line, before the body
+        probe, sep, body = response.partition(b"\n")
+        if not sep:
+            probe, body = b"", probe
+
+        rtt = None
+        sent_at = self._probe_send_times.get(probe.decode(errors="replace"))
+        if sent_at is not None:
+            rtt = now - sent_at
+
+        with self.hosts_lock:
+            host = self.hosts.get(addr)
+            if host is None or host.raw != body:
+                try:
+                    data = ujson.loads(body.decode())
+                except ValueError:
+                    return
+                if host is None:
+                    self.hosts[addr] = DiscoveredHost(addr, data, body, now, rtt)
+                    return
+                host.data = data
+                host.raw = body
+
+            host.last_seen = now
+            if rtt is not None:
+                if host.rtt is None:
+                    host.rtt = rtt
+                else:
+                    host.rtt += (rtt - host.rtt) * self.RTT_SMOOTHING
+
+    def get_hosts(self, max_rtt: float | None = None) -> list[DiscoveredHost]:
+        """
+        Returns the live hosts sorted by latency, dropping expired ones.
+        Hosts slower than `max_rtt` seconds are left out.
+        """
+
+        now = time.perf_counter()
+        with self.hosts_lock:
+            for addr, host in list(self.hosts.items()):
+                if now - host.last_seen > self.HOST_TTL:
+                    del self.hosts[addr]
+            hosts = list(self.hosts.values())
+
+        if max_rtt is not None:
+            hosts = [host for host in hosts if host.rtt is None or host.rtt <= max_rtt]
+        hosts.sort(key=lambda host: float("inf") if host.rtt is None else host.rtt)
+        return hosts
 
 
 class UDPClient:
-    """Sends some data to the UDP Server and receives data sent by other clients from the server"""
+    """
+    Sends some data to the UDP Server and receives data sent by other clients from the server
 
-    def __init__(self, server_ip: str, server_port: int) -> None:
+    The client joins the server before its state is accepted, and keeps the
+    session alive with heartbeats whenever it has nothing else to send.
+
+    The welcome names the hash of the server's map. If the game doesn't
+    already have that map, `download_map` fetches it into `map_data`.
+    """
+
+    HEARTBEAT_INTERVAL = 1.0
+    JOIN_RETRY_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        server_ip: str,
+        server_port: int,
+        stats_log_path: str | None = None,
+        packer: PacketPacker | None = None,
+    ) -> None:
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.settimeout(UDPClient.JOIN_RETRY_INTERVAL)
+        tune_socket(self.socket)
         self.server_addr = (server_ip, server_port)
+        self.packer = PacketPacker() if packer is None else packer
+        self.reassembler = Reassembler()
         self.is_alive = False
+        self.session_id: int | None = None
+        self.is_server_full = False
         self.received_data: bytes = b""
+        self.received_state: dict = {}
+        # Hits the server confirmed, by or against this client
+        self.received_hits: deque[dict] = deque(maxlen=64)
+        self.map_hash: str | None = None
+        self.map_download: MapDownload | None = None
+        self.map_data: bytes | None = None
+        self._map_chunk_count = 0
+        # Downloads are started by the game and carried on by the listener
+        self.map_lock = threading.Lock()
+        # Both the game and the listener send, and share the packer's counters
+        self.send_lock = threading.Lock()
+        self.stats = NetStats("client", log_path=stats_log_path)
+        self._seq = 0
+        self._last_echo = None
+        self._last_send = 0.0
+        self._last_join = 0.0
+        self.thread: threading.Thread | None = None
 
     def start(self):
         self.socket.connect(self.server_addr)
         self.is_alive = True
-        threading.Thread(target=self.listen, daemon=True).start()
+        self.join()
+        self.thread = threading.Thread(target=self.listen, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        if self.is_alive and self.session_id is not None:
+            try:
+                self.send_message({"type": "leave"})
+            except OSError:
+                pass
+        self.is_alive = False
+        self.session_id = None
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.socket.close()
+
+    def join(self):
+        self._last_join = time.perf_counter()
+        self.send_message({"type": "join"})
+
+    def keep_alive(self):
+        """Retries joining until accepted, then sends heartbeats when idle"""
+
+        now = time.perf_counter()
+        if self.session_id is None:
+            if now - self._last_join > UDPClient.JOIN_RETRY_INTERVAL:
+                self.join()
+        elif now - self._last_send > UDPClient.HEARTBEAT_INTERVAL:
+            self.send_message({"type": "heartbeat"})
+        if self.map_download is not None:
+            with self.map_lock:
+                self.request_map_chunks()
+
+    def download_map(self):
+        """Starts fetching the server's map, unless it's underway or done"""
+
+        with self.map_lock:
+            if (
+                self.map_hash is None
+                or self.map_download is not None
+                or self.map_data is not None
+            ):
+                return
+            self.map_download = MapDownload(self.map_hash, self._map_chunk_count)
+            self.request_map_chunks()
+
+    def request_map_chunks(self):
+        download = self.map_download
+        if download is None or self.session_id is None:
+            return
+        chunks = download.get_requests()
+        if chunks:
+            self.send_message(
+                {"type": "map_request", "map": download.hash, "chunks": chunks}
+            )
 
     def send(self, data: bytes):
-        self.socket.sendto(data, self.server_addr)
+        n_bytes = 0
+        with self.send_lock:
+            for datagram in self.packer.pack(data):
+                self.socket.sendto(datagram, self.server_addr)
+                n_bytes += len(datagram)
+            self._last_send = time.perf_counter()
+        self.stats.on_send(n_bytes)
+
+    def send_message(self, message: dict):
+        self.send(ujson.dumps(message).encode())
+
+    def send_state(self, state: dict):
+        """Stamps `state` with a sequence number and send time and sends it"""
+
+        if self.session_id is None:
+            return
+
+        self._seq += 1
+        state["type"] = "state"
+        state["seq"] = self._seq
+        state["t"] = time.perf_counter()
+
+        start = time.perf_counter()
+        data = ujson.dumps(state).encode()
+        self.stats.serialize_time.add(time.perf_counter() - start)
+        self.send(data)
+
+    def send_hitscan(self, origin, direction, max_distance: float):
+        """Asks the server to check a shot against the snapshot we last saw"""
+
+        if self.session_id is None:
+            return
+        self.send_message(
+            {
+                "type": "hit",
+                "view_seq": self.received_state.get("seq"),
+                "origin": [origin[0], origin[1]],
+                "direction": [direction[0], direction[1]],
+                "range": max_distance,
+            }
+        )
+
+    def send_melee(self, rect):
+        """Asks the server to check a melee hit against the snapshot we last saw"""
+
+        if self.session_id is None:
+            return
+        self.send_message(
+            {
+                "type": "hit",
+                "view_seq": self.received_state.get("seq"),
+                "area": [rect[0], rect[1], rect[2], rect[3]],
+            }
+        )
 
     def listen(self):
         while self.is_alive:
-            self.received_data = self.socket.recv(1024)
+            # Wakes up in time to ask again for map chunks that went missing
+            download = self.map_download
+            self.socket.settimeout(
+                UDPClient.JOIN_RETRY_INTERVAL if download is None else download.timeout
+            )
+            try:
+                datagram = self.socket.recv(RECV_SIZE)
+            except socket.timeout:
+                self.keep_alive()
+                continue
+            except OSError:
+                # The server isn't up yet, or we were closed
+                continue
+
+            self.keep_alive()
+            data = self.reassembler.add(datagram)
+            if data is None:
+                continue
+
+            start = time.perf_counter()
+            try:
+                message = ujson.loads(data.decode())
+            except ValueError:
+                continue
+            now = time.perf_counter()
+            self.stats.deserialize_time.add(now - start)
+            self.stats.on_receive(
+                self.reassembler.last_wire_size, seq=message.get("seq")
+            )
+
+            message_type = message.get("type")
+            if message_type == "snapshot":
+                self.on_snapshot(message, data, now)
+            elif message_type == "welcome":
+                self.session_id = message["id"]
+                self.is_server_full = False
+                self.on_welcome(message)
+            elif message_type == "full":
+                self.is_server_full = True
+            elif message_type == "kicked":
+                self.session_id = None
+            elif message_type == "hit":
+                self.received_hits.append(message)
+            elif message_type == "map_chunk":
+                self.on_map_chunk(message)
+
+    def on_welcome(self, welcome: dict):
+        map_hash = welcome.get("map")
+        n_chunks = welcome.get("map_chunks", 0)
+        if not is_map_hash(map_hash):
+            # Anything else would be joined into a path, so it counts as no map
+            map_hash = None
+        if not isinstance(n_chunks, int) or not 0 <= n_chunks <= MAX_MAP_CHUNKS:
+            map_hash = None
+            n_chunks = 0
+        if map_hash == self.map_hash:
+            return
+        with self.map_lock:
+            self.map_hash = map_hash
+            self._map_chunk_count = n_chunks
+            self.map_download = None
+            self.map_data = None
+
+    def on_map_chunk(self, message: dict):
+        with self.map_lock:
+            self._on_map_chunk(message)
+
+    def _on_map_chunk(self, message: dict):
+        download = self.map_download
+        index, data = message.get("index"), message.get("data")
+        if download is None or message.get("map") != download.hash:
+            return
+        if not isinstance(index, int) or not isinstance(data, str):
+            return
+
+        download.add(index, data)
+        if not download.is_complete:
+            self.request_map_chunks()
+            return
+
+        try:
+            self.map_data = download.finish()
+        except ValueError:
+            # Start over rather than play on a broken map
+            self.map_download = MapDownload(download.hash, len(download.chunks))
+            self.request_map_chunks()
+            return
+        self.map_download = None
+
+    def on_snapshot(self, snapshot: dict, data: bytes, received_at: float):
+        echo = snapshot.get("echo")
+        if echo is not None and echo != self._last_echo:
+            self._last_echo = echo
+            self.stats.rtt.add(received_at - echo)
+
+        self.received_data = data
+        self.received_state = snapshot
@@ -0,0 +1,63 @@
+import typing as t
+
+Rect: t.TypeAlias = tuple[float, float, float, float]
+
+
+class PositionHistory:
+    """
+    Fixed size ring buffer of timestamped rects, oldest first.
+
+    Samples have to be added in increasing time order, which holds when
+    they are stamped with the time the server received them.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.capacity = capacity
+        self.times = [0.0] * capacity
+        self.rects: list[Rect] = [(0.0, 0.0, 0.0, 0.0)] * capacity
+        self.start = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, time: float, rect: Rect):
+        if self.count and time <= self.times[self._index(self.count - 1)]:
+            return
+
+        if self.count < self.capacity:
+            index = self._index(self.count)
+            self.count += 1
+        else:
+            # Full, so the oldest sample makes room
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.times[index] = time
+        self.rects[index] = rect
+
+    def latest(self) -> Rect | None:
+        if not self.count:
+            return None
+        return self.rects[self._index(self.count - 1)]
+
+    def rewind(self, time: float) -> Rect | None:
+        """
+        The newest rect at or before `time`, found by binary search.
+        Times before the oldest sample get the oldest one.
+        """
+
+        if not self.count:
+            return None
+
+        # First sample newer than `time`
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self.times[self._index(mid)] <= time:
+                low = mid + 1
+            else:
+                high = mid
+        return self.rects[self._index(max(0, low - 1))]
+
+    def _index(self, i: int) -> int:
+        return (self.start + i) % self.capacity
@@ -0,0 +1,148 @@
+import functools
+import math
+import typing as t
+
+import numpy as np
+import pygame
+
+from src import shared
+
+from .cache import SurfaceCache
+from .spatial import SpatialGrid
+
+
+@functools.lru_cache(maxsize=256)
+def make_light_sprite(radius: int, color: tuple[int, int, int]) -> pygame.Surface:
+    """Round glow of `color` in the middle, fading to black at `radius`"""
+
+    coords = np.arange(radius * 2) - radius + 0.5
+    distance = np.hypot(coords[:, None], coords[None, :]) / radius
+    # Smoothstep, so the glow has no hard edge and a broad bright middle
+    closeness = np.clip(1 - distance, 0, 1)
+    falloff = closeness * closeness * (3 - 2 * closeness)
+    pixels = (falloff[..., None] * np.array(color, np.float32)).astype(np.uint8)
+
+    surf = pygame.Surface((radius * 2, radius * 2))
+    pygame.surfarray.blit_array(surf, pixels)
+    return surf
+
+
+class Light:
+    """Glow of `color` around `pos`, fading out over `radius` pixels"""
+
+    # Lights that never move, baked into the chunks of a LightMap
+    static_lights: list[t.Self] = []
+    # Lights that move, gathered again every frame
+    temp_lights: list[t.Self] = []
+
+    __slots__ = ("pos", "radius", "color")
+
+    def __init__(self, pos, radius: int, color, static: bool = False) -> None:
+        self.pos = pygame.Vector2(pos)
+        self.radius = radius
+        color = pygame.Color(color)
+        self.color = (color.r, color.g, color.b)
+
+        if static:
+            Light.static_lights.append(self)
+
+    @property
+    def rect(self) -> tuple[float, float, float, float]:
+        return (
+            self.pos.x - self.radius,
+            self.pos.y - self.radius,
+            self.radius * 2,
+            self.radius * 2,
+        )
+
+    def get_blit(self, zoom: float, left: int, top: int) -> tuple:
+        """The sprite and where it goes on a surface whose corner is `left, top`"""
+
+        radius = max(1, round(self.radius * zoom))
+        return (
+            make_light_sprite(radius, self.color),
+            (
+                round(self.pos.x * zoom) - radius - left,
+                round(self.pos.y * zoom) - radius - top,
+            ),
+        )
+
+
+class LightMap:
+    """
+    Darkens the screen down to `ambient` and lights it back up around lights,
+    applied with one `BLEND_MULT` blit per frame.
+
+    Static lights are added into chunks baked once per zoom level and kept
+    in an LRU, so they cost one blit per visible chunk however many there
+    are. Lights in `Light.temp_lights` are added on top every frame.
+    """
+
+    CHUNK_SIZE = 512
+    CHUNK_CACHE_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, static_lights: list[Light], ambient=(70, 50, 55)) -> None:
+        self.ambient = pygame.Color(ambient)
+        self.grid = SpatialGrid(LightMap.CHUNK_SIZE)
+        for light in static_lights:
+            self.grid.insert(light, *light.rect)
+        self.chunks = SurfaceCache(LightMap.CHUNK_CACHE_BYTES)
+        self.surface = pygame.Surface(shared.srect.size)
+
+    def bake_chunk(self, cx: int, cy: int, zoom: float) -> pygame.Surface:
+        size = LightMap.CHUNK_SIZE
+        left = math.floor(cx * size * zoom)
+        top = math.floor(cy * size * zoom)
+        width = math.floor((cx + 1) * size * zoom) - left
+        height = math.floor((cy + 1) * size * zoom) - top
+
+        surf = pygame.Surface((width, height))
+        surf.fill(self.ambient)
+        surf.fblits(
+            [
+                light.get_blit(zoom, left, top)
+                for light in self.grid.cells.get((cx, cy), ())
+            ],
+            pygame.BLEND_ADD,
+        )
+        return surf
+
+    def draw(self):
+        camera = shared.camera
+        zoom = camera.zoom
+        size = LightMap.CHUNK_SIZE
+        offset_x = round(camera.offset.x * zoom)
+        offset_y = round(camera.offset.y * zoom)
+        self.surface.fill(self.ambient)
+
+        view_width, view_height = camera.view_size
+        left, top, right, bottom = self.grid.get_cell_range(
+            camera.offset.x, camera.offset.y, view_width, view_height
+        )
+        chunks = []
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                # Chunks without lights would only be ambient, like the fill
+                if (cx, cy) not in self.grid.cells:
+                    continue
+                key = (cx, cy, zoom)
+                chunk = self.chunks.get(key)
+                if chunk is None:
+                    chunk = self.bake_chunk(cx, cy, zoom)
+                    self.chunks.put(key, chunk)
+                chunks.append(
+                    (
+                        chunk,
+                        (
+                            math.floor(cx * size * zoom) - offset_x,
+                            math.floor(cy * size * zoom) - offset_y,
+                        ),
+                    )
+                )
+        self.surface.fblits(chunks)
+
+        self.surface.fblits(
+            [light.get_blit(zoom, offset_x, offset_y) for light in Light.temp_lights],
+            pygame.BLEND_ADD,
+        )
+        shared.screen.blit(self.surface, (0, 0), special_flags=pygame.BLEND_MULT)
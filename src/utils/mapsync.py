@@ -0,0 +1,139 @@
+import base64
+import hashlib
+import os
+import re
+import time
+import zlib
+from pathlib import Path
+
+# Raw bytes per chunk, small enough that a chunk message fits one datagram
+MAP_CHUNK_SIZE = 768
+# Largest map accepted from a server, and so the most chunks it can take
+MAX_MAP_SIZE = 16 * 1024 * 1024
+MAX_MAP_CHUNKS = 4096
+
+
+def hash_map(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def is_map_hash(value) -> bool:
+    """Whether `value` looks like a `hash_map` result, safe to use as a file name"""
+
+    return isinstance(value, str) and re.fullmatch(r"[0-9a-f]{40}", value) is not None
+
+
+def pack_map_chunks(data: bytes, chunk_size: int = MAP_CHUNK_SIZE) -> list[str]:
+    """Compresses a map and splits it into base64 chunks for JSON messages"""
+
+    compressed = zlib.compress(data, 9)
+    return [
+        base64.b64encode(compressed[i : i + chunk_size]).decode()
+        for i in range(0, len(compressed), chunk_size)
+    ]
+
+
+class MapCache:
+    """Maps kept on disk by the hash of their contents"""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def get_path(self, map_hash: str) -> Path:
+        # Hashes come from the server, so they must not lead out of the cache
+        if not is_map_hash(map_hash):
+            raise ValueError(f"`{map_hash}` is not a map hash")
+        return self.directory / f"{map_hash}.json"
+
+    def __contains__(self, map_hash: str) -> bool:
+        return is_map_hash(map_hash) and self.get_path(map_hash).exists()
+
+    def put(self, data: bytes) -> Path:
+        path = self.get_path(hash_map(data))
+        if path.exists():
+            return path
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Written aside first, so a crash never leaves a truncated map behind
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+        return path
+
+    def remove(self, map_hash: str):
+        if is_map_hash(map_hash):
+            self.get_path(map_hash).unlink(missing_ok=True)
+
+
+class MapDownload:
+    """
+    Collects the chunks of a map from the server. Chunks that haven't
+    arrived `timeout` seconds after being asked for are asked for again,
+    with at most `window` chunks in flight at once.
+    """
+
+    def __init__(
+        self, map_hash: str, n_chunks: int, window: int = 32, timeout: float = 0.25
+    ) -> None:
+        self.hash = map_hash
+        self.chunks: list[bytes | None] = [None] * n_chunks
+        self.n_received = 0
+        self.window = window
+        self.timeout = timeout
+        self.requested_at: dict[int, float] = {}
+        self._next_index = 0
+
+    @property
+    def progress(self) -> float:
+        return self.n_received / len(self.chunks) if self.chunks else 1.0
+
+    @property
+    def is_complete(self) -> bool:
+        return self.n_received == len(self.chunks)
+
+    def get_requests(self) -> list[int]:
+        """The chunks to ask for now, marking them as asked for"""
+
+        now = time.perf_counter()
+        requests = [
+            index
+            for index, requested_at in self.requested_at.items()
+            if now - requested_at > self.timeout
+        ]
+        while len(self.requested_at) < self.window and self._next_index < len(
+            self.chunks
+        ):
+            if self.chunks[self._next_index] is None:
+                requests.append(self._next_index)
+            self._next_index += 1
+
+        for index in requests:
+            self.requested_at[index] = now
+        return requests
+
+    def add(self, index: int, data: str):
+        if not 0 <= index < len(self.chunks) or self.chunks[index] is not None:
+            return
+        try:
+            self.chunks[index] = base64.b64decode(data, validate=True)
+        except ValueError:
+            # Asked for again once it times out
+            return
+        self.n_received += 1
+        self.requested_at.pop(index, None)
+
+    def finish(self) -> bytes:
+        """The map, once every chunk is in. Raises ValueError if it's corrupt."""
+
+        decompressor = zlib.decompressobj()
+        try:
+            data = decompressor.decompress(
+                b"".join(self.chunks), MAX_MAP_SIZE  # type: ignore
+            )
+        except zlib.error as e:
+            raise ValueError(f"Map `{self.hash}` failed to decompress") from e
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            raise ValueError(f"Map `{self.hash}` is cut short or too big")
+        if hash_map(data) != self.hash:
+            raise ValueError(f"Map `{self.hash}` arrived with the wrong hash")
+        return data
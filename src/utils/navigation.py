@@ -0,0 +1,374 @@
+import heapq
+import itertools
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import ujson
+
+from src import shared
+
+from .spatial import SpatialGrid
+
+NAV_CACHE_VERSION = 1
+
+# A floor's rect, `(x, y, width, height)`, which doubles as its node
+Node = tuple[int, int, int, int]
+
+
+def get_nav_cache_path(map_path: str | Path) -> Path:
+    """Where the navigation graph of a map is cached, right beside it"""
+
+    return Path(map_path).with_suffix(".nav.json")
+
+
+def get_fall_time(v0: float, drop: float) -> float | None:
+    """
+    Seconds until something moving down at `v0` has dropped `drop` pixels
+    under `WORLD_GRAVITY`, capped at `MAX_FALL_VELOCITY`. Negative `v0`
+    is a jump and negative `drop` a landing above the start, on the way
+    down. None when the jump never gets that high.
+    """
+
+    g = shared.WORLD_GRAVITY
+    v_max = shared.MAX_FALL_VELOCITY
+    # Time and distance to reach the fall velocity cap
+    t_cap = (v_max - v0) / g
+    d_cap = v0 * t_cap + g * t_cap * t_cap / 2
+    if drop > d_cap:
+        return t_cap + (drop - d_cap) / v_max
+
+    discriminant = v0 * v0 + 2 * g * drop
+    if discriminant < 0:
+        return None
+    return (-v0 + math.sqrt(discriminant)) / g
+
+
+@dataclass(frozen=True)
+class NavBody:
+    """How big something is and how it moves, which decides where it can go"""
+
+    size: tuple[int, int]
+    speed: float
+    jump_velocity: float
+    # Drops further than this are left out, the way down is a respawn
+    max_drop: float = 1000
+
+    @property
+    def jump_height(self) -> float:
+        return self.jump_velocity**2 / (2 * shared.WORLD_GRAVITY)
+
+    @property
+    def reach(self) -> float:
+        """Furthest it can get sideways in the air, jumping down `max_drop`"""
+
+        air_time = get_fall_time(self.jump_velocity, self.max_drop)
+        return self.speed * air_time  # type: ignore
+
+
+@dataclass
+class NavEdge:
+    """
+    A way from one floor to `target`, taking `cost` seconds from the
+    middle of one to the middle of the other. `takeoff` and `landing` are
+    where the feet leave the first floor and come down on the second.
+    """
+
+    kind: str
+    target: Node
+    cost: float
+    takeoff: float
+    landing: float
+
+
+class NavGraph:
+    """
+    Where a `NavBody` can get to across a map's floors, by walking onto
+    the next floor, jumping or falling.
+
+    Every floor with room above it to stand is a node. Edges follow the
+    player's movement (`speed` sideways, `jump_velocity` up and gravity
+    down) but don't check for floors in the way while in the air.
+
+    Found paths are kept in an LRU. Adding a floor only rebuilds the edges
+    of floors within reach of it, and forgets the paths through them.
+    """
+
+    CELL_SIZE = 128
+    PATH_CACHE_SIZE = 4096
+
+    def __init__(self, floors: list[Node], body: NavBody) -> None:
+        self.body = body
+        self.grid = SpatialGrid(NavGraph.CELL_SIZE)
+        for floor in floors:
+            self.grid.insert(floor, *floor)
+        # Outgoing edges of every node
+        self.edges: dict[Node, list[NavEdge]] = {}
+        # Found paths keyed by (start, goal), None when there is no way
+        self.paths: OrderedDict[tuple, list[NavEdge] | None] = OrderedDict()
+
+    @classmethod
+    def build(cls, floors: list[Node], body: NavBody) -> "NavGraph":
+        graph = cls(floors, body)
+        graph.edges = {floor: [] for floor in floors if graph.is_standable(floor)}
+        for node in graph.edges:
+            graph.update_node(node)
+        return graph
+
+    @classmethod
+    def load_or_build(
+        cls, floors: list[Node], body: NavBody, cache_path: str | Path, map_hash: str
+    ) -> "NavGraph":
+        """
+        Loads the graph cached at `cache_path`, or builds it and caches it
+        there when the cache is missing or was made for another map or body
+        """
+
+        cache_path = Path(cache_path)
+        try:
+            with open(cache_path) as f:
+                cached = ujson.load(f)
+        except (OSError, ValueError):
+            cached = None
+
+        if cached is not None and cached.get("key") == cls.get_cache_key(
+            body, map_hash
+        ):
+            graph = cls(floors, body)
+            for node, edges in cached["edges"]:
+                graph.edges[tuple(node)] = [  # type: ignore
+                    NavEdge(kind, tuple(target), cost, takeoff, landing)  # type: ignore
+                    for kind, target, cost, takeoff, landing in edges
+                ]
+            return graph
+
+        graph = cls.build(floors, body)
+        graph.save(cache_path, map_hash)
+        return graph
+
+    @staticmethod
+    def get_cache_key(body: NavBody, map_hash: str) -> list:
+        return [
+            NAV_CACHE_VERSION,
+            map_hash,
+            *body.size,
+            body.speed,
+            body.jump_velocity,
+            body.max_drop,
+            shared.WORLD_GRAVITY,
+            shared.MAX_FALL_VELOCITY,
+        ]
+
+    def save(self, cache_path: str | Path, map_hash: str):
+        cached = {
+            "key": self.get_cache_key(self.body, map_hash),
+            "edges": [
+                [
+                    node,
+                    [
+                        [edge.kind, edge.target, edge.cost, edge.takeoff, edge.landing]
+                        for edge in edges
+                    ],
+                ]
+                for node, edges in self.edges.items()
+            ],
+        }
+        try:
+            with open(cache_path, "w") as f:
+                ujson.dump(cached, f)
+        except OSError:
+            # Only costs building it again next time
+            pass
+
+    def is_standable(self, floor: Node) -> bool:
+        """Whether there's room to stand in the middle of `floor`"""
+
+        width, height = self.body.size
+        x, y, w, _ = floor
+        space = (x + (w - width) / 2, y - height, width, height)
+        return not any(
+            self._overlaps(other, space)
+            for other in self.grid.query(*space)
+            if other != floor
+        )
+
+    def update_node(self, node: Node):
+        """Works out the edges of `node` again"""
+
+        body = self.body
+        x, y, w, _ = node
+        area = (
+            x - body.reach,
+            y - body.jump_height,
+            w + body.reach * 2,
+            body.jump_height + body.max_drop,
+        )
+        edges = []
+        for target in self.grid.query(*area):
+            if target == node or target not in self.edges:
+                continue
+            edge = self.get_edge(node, target)
+            if edge is not None:
+                edges.append(edge)
+        self.edges[node] = edges
+
+    def get_edge(self, start: Node, target: Node) -> NavEdge | None:
+        body = self.body
+        half_width = body.size[0] / 2
+        x, y, w, _ = start
+        tx, ty, tw, _ = target
+        start_middle = x + w / 2
+        target_middle = tx + tw / 2
+
+        if ty == y and (tx == x + w or tx + tw == x):
+            edge_x = tx if tx == x + w else x
+            return NavEdge(
+                "walk",
+                target,
+                abs(target_middle - start_middle) / body.speed,
+                edge_x,
+                edge_x,
+            )
+
+        direction = 1 if target_middle >= start_middle else -1
+        drop = ty - y
+        if drop > body.max_drop:
+            return None
+
+        ways = []
+        if drop > 0 and (tx + tw > x + w if direction > 0 else tx < x):
+            # Walks off the edge, just far enough that nothing is underfoot
+            takeoff = x + w + half_width if direction > 0 else x - half_width
+            ways.append(("fall", takeoff, 0))
+        # Jumping from under the target would hit its bottom
+        if tx >= x + w if direction > 0 else tx + tw <= x:
+            takeoff = x + w - half_width if direction > 0 else x + half_width
+            ways.append(("jump", takeoff, body.jump_velocity))
+
+        best = None
+        for kind, takeoff, v0 in ways:
+            air_time = get_fall_time(v0, drop)
+            if air_time is None:
+                continue
+            landing = min(max(takeoff, tx + half_width), tx + tw - half_width)
+            if abs(landing - takeoff) > body.speed * air_time:
+                continue
+            cost = (
+                abs(takeoff - start_middle) + abs(target_middle - landing)
+            ) / body.speed + air_time
+            if best is None or cost < best.cost:
+                best = NavEdge(kind, target, cost, takeoff, landing)
+        return best
+
+    def get_reaching_area(self, floor: Node) -> tuple[float, float, float, float]:
+        """Where the floors that could have an edge to `floor` are"""
+
+        body = self.body
+        x, y, w, _ = floor
+        return (
+            x - body.reach,
+            y - body.max_drop,
+            w + body.reach * 2,
+            body.max_drop + body.jump_height,
+        )
+
+    def add_floor(self, floor: Node):
+        """Adds a floor, rebuilding only the edges it could have changed"""
+
+        self.grid.insert(floor, *floor)
+        x, y, w, h = floor
+        # It, and the floors under it that may have lost the room to stand
+        changed = self.grid.query(x, y, w, h + self.body.size[1])
+        affected = set()
+        for changed_floor in changed:
+            if self.is_standable(changed_floor):
+                self.edges.setdefault(changed_floor, [])
+            else:
+                self.edges.pop(changed_floor, None)
+            affected |= self.grid.query(*self.get_reaching_area(changed_floor))
+        for node in affected:
+            if node in self.edges:
+                self.update_node(node)
+        self.forget_paths(affected)
+
+    def forget_paths(self, nodes: set[Node]):
+        """Drops found paths through `nodes`, and those that found no way"""
+
+        for key, path in list(self.paths.items()):
+            if (
+                path is None
+                or key[0] in nodes
+                or any(edge.target in nodes for edge in path)
+            ):
+                del self.paths[key]
+
+    def get_node_at(self, x: float, y: float) -> Node | None:
+        """The node whose top is under the feet at `x, y`"""
+
+        for node in self.grid.query(x, y, 0, 1):
+            if node in self.edges and node[1] == y:
+                return node
+        return None
+
+    def find_path(self, start: Node, goal: Node) -> list[NavEdge] | None:
+        """The edges to follow from `start` to `goal`, or None if there's no way"""
+
+        key = (start, goal)
+        if key in self.paths:
+            self.paths.move_to_end(key)
+            return self.paths[key]
+
+        path = self.search(start, goal)
+        self.paths[key] = path
+        if len(self.paths) > NavGraph.PATH_CACHE_SIZE:
+            self.paths.popitem(last=False)
+        return path
+
+    def search(self, start: Node, goal: Node) -> list[NavEdge] | None:
+        """A*, with the time to cover the sideways distance as the estimate"""
+
+        if start not in self.edges or goal not in self.edges:
+            return None
+
+        speed = self.body.speed
+        goal_middle = goal[0] + goal[2] / 2
+
+        def estimate(node: Node) -> float:
+            return abs(node[0] + node[2] / 2 - goal_middle) / speed
+
+        # Breaks ties in order of discovery, so nodes never get compared
+        counter = itertools.count()
+        frontier = [(estimate(start), next(counter), start)]
+        costs = {start: 0.0}
+        came_by: dict[Node, tuple[Node, NavEdge]] = {}
+        while frontier:
+            _, _, node = heapq.heappop(frontier)
+            if node == goal:
+                path = []
+                while node in came_by:
+                    node, edge = came_by[node]
+                    path.append(edge)
+                path.reverse()
+                return path
+
+            cost = costs[node]
+            for edge in self.edges[node]:
+                new_cost = cost + edge.cost
+                if new_cost < costs.get(edge.target, math.inf):
+                    costs[edge.target] = new_cost
+                    came_by[edge.target] = (node, edge)
+                    heapq.heappush(
+                        frontier,
+                        (new_cost + estimate(edge.target), next(counter), edge.target),
+                    )
+
+        return None
+
+    @staticmethod
+    def _overlaps(rect, other) -> bool:
+        """Like `colliderect`, touching edges don't count"""
+
+        x, y, w, h = rect
+        ox, oy, ow, oh = other
+        return x < ox + ow and ox < x + w and y < oy + oh and oy < y + h
@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import random
+import selectors
+import socket
+import threading
+import time
+import typing as t
+from dataclasses import dataclass
+
+from .packets import RECV_SIZE
+
+
+@dataclass
+class NetworkConditions:
+    """How badly the conditioner treats each datagram. Times are in seconds."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    loss: float = 0.0
+    duplicate: float = 0.0
+    reorder: float = 0.0
+
+    @classmethod
+    def from_string(cls, spec: str) -> t.Self:
+        """
+        Parses specs like `latency=80,jitter=20,loss=0.05`.
+        Latency and jitter are given in milliseconds, the rest are chances.
+        """
+
+        conditions = cls()
+        for item in spec.split(","):
+            if not item.strip():
+                continue
+            key, _, value = item.partition("=")
+            key = key.strip()
+            if key not in cls.__dataclass_fields__:
+                raise ValueError(f"Unknown network condition `{key}`")
+
+            number = float(value)
+            if key in ("latency", "jitter"):
+                number /= 1000
+            setattr(conditions, key, number)
+        return conditions
+
+
+class NetworkConditioner:
+    """
+    UDP proxy that sits between clients and a server and delays, drops,
+    duplicates and reorders the datagrams passing through it.
+
+    Clients send to `addr` instead of the server. Every client gets its own
+    upstream socket so the server still sees one address per client.
+    """
+
+    def __init__(
+        self,
+        server_addr: tuple[str, int],
+        conditions: NetworkConditions,
+        listen_addr: tuple[str, int] = ("127.0.0.1", 0),
+        seed: int | None = None,
+    ) -> None:
+        self.server_addr = server_addr
+        self.conditions = conditions
+        self.random = random.Random(seed)
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(listen_addr)
+        self.addr = self.socket.getsockname()
+
+        self.upstreams: dict[tuple, socket.socket] = {}
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ, None)
+
+        # (deliver_at, order, socket, data, addr)
+        self.queue: list[tuple] = []
+        self._order = itertools.count()
+        self.is_running = False
+
+    def start(self):
+        self.is_running = True
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def close(self):
+        self.is_running = False
+        self.selector.close()
+        for upstream in self.upstreams.values():
+            upstream.close()
+        self.socket.close()
+
+    def get_upstream(self, client_addr) -> socket.socket:
+        upstream = self.upstreams.get(client_addr)
+        if upstream is None:
+            upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            upstream.bind(("0.0.0.0", 0))
+            self.upstreams[client_addr] = upstream
+            self.selector.register(upstream, selectors.EVENT_READ, client_addr)
+        return upstream
+
+    def schedule(self, sock: socket.socket, data: bytes, addr):
+        conditions = self.conditions
+        if self.random.random() < conditions.loss:
+            return
+
+        copies = 2 if self.random.random() < conditions.duplicate else 1
+        for _ in range(copies):
+            delay = conditions.latency + self.random.uniform(
+                -conditions.jitter, conditions.jitter
+            )
+            if self.random.random() < conditions.reorder:
+                # Held back long enough for the next few datagrams to overtake it
+                delay += conditions.jitter * 2 + 0.01
+            deliver_at = time.perf_counter() + max(0.0, delay)
+            heapq.heappush(
+                self.queue, (deliver_at, next(self._order), sock, data, addr)
+            )
+
+    def flush(self):
+        now = time.perf_counter()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, sock, data, addr = heapq.heappop(self.queue)
+            try:
+                sock.sendto(data, addr)
+            except OSError:
+                pass
+
+    def run(self):
+        while self.is_running:
+            timeout = 0.05
+            if self.queue:
+                timeout = max(0.0, self.queue[0][0] - time.perf_counter())
+
+            try:
+                events = self.selector.select(timeout)
+            except (OSError, ValueError):
+                break
+
+            for key, _ in events:
+                sock: socket.socket = key.fileobj  # type: ignore
+                try:
+                    data, addr = sock.recvfrom(RECV_SIZE)
+                except OSError:
+                    continue
+
+                if key.data is None:
+                    self.schedule(self.get_upstream(addr), data, self.server_addr)
+                else:
+                    self.schedule(self.socket, data, key.data)
+
+            self.flush()
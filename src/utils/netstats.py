@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import ujson
+
+
+class RollingHistogram:
+    """Keeps the most recent samples of a value and summarises them"""
+
+    def __init__(self, window: int = 512) -> None:
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def add(self, value: float):
+        self.samples.append(value)
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"count": 0}
+
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {
+            "count": len(ordered),
+            "mean": sum(ordered) / len(ordered),
+            "p50": ordered[last // 2],
+            "p95": ordered[int(last * 0.95)],
+            "p99": ordered[int(last * 0.99)],
+            "max": ordered[last],
+        }
+
+
+class RateCounter:
+    """Counts a total and its rate over the last `window` seconds"""
+
+    def __init__(self, window: float = 1.0) -> None:
+        self.window = window
+        self.total = 0
+        self._events: deque[tuple[float, int]] = deque()
+        self._in_window = 0
+
+    def add(self, amount: int = 1):
+        now = time.perf_counter()
+        self.total += amount
+        self._events.append((now, amount))
+        self._in_window += amount
+        self._trim(now)
+
+    def _trim(self, now: float):
+        while self._events and now - self._events[0][0] > self.window:
+            self._in_window -= self._events.popleft()[1]
+
+    def rate(self) -> float:
+        self._trim(time.perf_counter())
+        return self._in_window / self.window
+
+
+class SequenceTracker:
+    """Derives loss and reordering from the sequence numbers of a stream"""
+
+    def __init__(self) -> None:
+        self.first_seq: int | None = None
+        self.highest_seq = -1
+        self.received = 0
+        self.reordered = 0
+
+    def add(self, seq: int):
+        if self.first_seq is None:
+            self.first_seq = seq
+        self.received += 1
+        if seq < self.highest_seq:
+            self.reordered += 1
+        else:
+            self.highest_seq = seq
+
+    @property
+    def lost(self) -> int:
+        if self.first_seq is None:
+            return 0
+        expected = self.highest_seq - self.first_seq + 1
+        return max(0, expected - self.received)
+
+    def summary(self) -> dict:
+        expected = self.received + self.lost
+        return {
+            "received": self.received,
+            "lost": self.lost,
+            "reordered": self.reordered,
+            "loss_ratio": self.lost / expected if expected else 0.0,
+        }
+
+
+class PeerStats:
+    """Traffic seen from a single peer"""
+
+    def __init__(self) -> None:
+        self.packets_in = RateCounter()
+        self.bytes_in = RateCounter()
+        self.sequence = SequenceTracker()
+        self.last_seen = time.perf_counter()
+
+    def summary(self) -> dict:
+        return {
+            "packets_in": self.packets_in.total,
+            "packets_in_per_sec": self.packets_in.rate(),
+            "bytes_in_per_sec": self.bytes_in.rate(),
+            "idle": time.perf_counter() - self.last_seen,
+            **self.sequence.summary(),
+        }
+
+
+class NetStats:
+    """
+    Traffic statistics shared by `UDPClient` and `UDPServer`.
+
+    Pass `log_path` to append a JSON line with a snapshot every
+    `log_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        log_path: str | Path | None = None,
+        log_interval: float = 5.0,
+    ) -> None:
+        self.name = name
+        self.log_path = log_path
+        self.log_interval = log_interval
+        self._last_log = time.perf_counter()
+        self._lock = threading.Lock()
+
+        self.packets_in = RateCounter()
+        self.packets_out = RateCounter()
+        self.bytes_in = RateCounter()
+        self.bytes_out = RateCounter()
+        self.sequence = SequenceTracker()
+        self.rtt = RollingHistogram()
+        self.packet_size = RollingHistogram()
+        self.serialize_time = RollingHistogram()
+        self.deserialize_time = RollingHistogram()
+        self.peers: dict[object, PeerStats] = {}
+
+    def on_send(self, n_bytes: int):
+        with self._lock:
+            self.packets_out.add()
+            self.bytes_out.add(n_bytes)
+            self.packet_size.add(n_bytes)
+
+        self.maybe_log()
+
+    def on_receive(self, n_bytes: int, peer: object = None, seq: int | None = None):
+        with self._lock:
+            self.packets_in.add()
+            self.bytes_in.add(n_bytes)
+
+            if peer is None:
+                if seq is not None:
+                    self.sequence.add(seq)
+            else:
+                peer_stats = self.peers.get(peer)
+                if peer_stats is None:
+                    peer_stats = self.peers[peer] = PeerStats()
+                peer_stats.packets_in.add()
+                peer_stats.bytes_in.add(n_bytes)
+                peer_stats.last_seen = time.perf_counter()
+                if seq is not None:
+                    peer_stats.sequence.add(seq)
+
+        self.maybe_log()
+
+    def forget_peer(self, peer: object):
+        with self._lock:
+            self.peers.pop(peer, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "packets_in": self.packets_in.total,
+                "packets_out": self.packets_out.total,
+                "bytes_in": self.bytes_in.total,
+                "bytes_out": self.bytes_out.total,
+                "packets_in_per_sec": self.packets_in.rate(),
+                "packets_out_per_sec": self.packets_out.rate(),
+                "bytes_in_per_sec": self.bytes_in.rate(),
+                "bytes_out_per_sec": self.bytes_out.rate(),
+                "sequence": self.sequence.summary(),
+                "rtt": self.rtt.summary(),
+                "packet_size": self.packet_size.summary(),
+                "serialize_time": self.serialize_time.summary(),
+                "deserialize_time": self.deserialize_time.summary(),
+                "peers": {
+                    str(peer): peer_stats.summary()
+                    for peer, peer_stats in self.peers.items()
+                },
+            }
+
+    def maybe_log(self):
+        if self.log_path is None:
+            return
+
+        now = time.perf_counter()
+        if now - self._last_log < self.log_interval:
+            return
+        self._last_log = now
+
+        line = ujson.dumps({"time": time.time(), **self.snapshot()})
+        with open(self.log_path, "a") as f:
+            f.write(line + "\n")
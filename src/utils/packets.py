@@ -0,0 +1,157 @@
+import socket
+import struct
+import time
+import zlib
+
+# Payload bytes per datagram stay under this so nothing gets fragmented by IP
+DEFAULT_MTU = 1200
+# Large enough for any datagram, so a recv never truncates one
+RECV_SIZE = 65535
+SOCKET_BUFFER_SIZE = 1 << 20
+
+MAGIC = 0xE1
+FLAG_COMPRESSED = 1
+# magic, flags, message id, fragment index, fragment count
+HEADER = struct.Struct(">BBIHH")
+
+# Primes zlib with the strings every snapshot repeats, which matters most for
+# the small single-player messages where there is little to back-reference
+ZDICT = (
+    b'"default_outfit\\"}","seq":"t":"echo":"clients":[{"pos":['
+    b'"size":["character_data":"{\\"name\\":\\"guest_\\",'
+    b'\\"hair\\":\\"default_hair\\",\\"face\\":\\"default_face\\",'
+    b'\\"outfit\\":\\"'
+)
+
+
+def tune_socket(sock: socket.socket, buffer_size: int = SOCKET_BUFFER_SIZE):
+    """Grows the kernel buffers so bursts of fragments aren't dropped"""
+
+    for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, buffer_size)
+        except OSError:
+            pass
+
+
+class PacketPacker:
+    """Turns a message into one or more datagrams"""
+
+    def __init__(
+        self,
+        mtu: int = DEFAULT_MTU,
+        compress: bool = True,
+        compress_threshold: int = 128,
+    ) -> None:
+        self.chunk_size = mtu - HEADER.size
+        self.compress = compress
+        self.compress_threshold = compress_threshold
+        self._msg_id = 0
+
+    def pack(self, payload: bytes) -> list[bytes]:
+        flags = 0
+        if self.compress and len(payload) >= self.compress_threshold:
+            compressor = zlib.compressobj(zdict=ZDICT)
+            compressed = compressor.compress(payload) + compressor.flush()
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= FLAG_COMPRESSED
+
+        self._msg_id = (self._msg_id + 1) & 0xFFFFFFFF
+        count = max(1, -(-len(payload) // self.chunk_size))
+        if count > 0xFFFF:
+            raise ValueError(f"Message of {len(payload)} bytes is too large to send")
+
+        return [
+            HEADER.pack(MAGIC, flags, self._msg_id, i, count)
+            + payload[i * self.chunk_size : (i + 1) * self.chunk_size]
+            for i in range(count)
+        ]
+
+
+class _PartialMessage:
+    def __init__(self, count: int, flags: int) -> None:
+        self.fragments: list[bytes | None] = [None] * count
+        self.missing = count
+        self.wire_size = 0
+        self.flags = flags
+        self.started = time.perf_counter()
+
+
+class Reassembler:
+    """
+    Collects fragments per sender and returns whole messages. Messages that
+    stay incomplete for `timeout` seconds are dropped.
+
+    `last_wire_size` holds the number of bytes the last returned message took
+    on the wire, headers included.
+
+    Messages of more than `max_fragments` fragments, or that would come out
+    larger than `max_size` bytes, are dropped, so a few small compressed
+    datagrams can't be made to expand into megabytes.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 1.0,
+        max_pending: int = 64,
+        max_fragments: int = 64,
+        max_size: int = 256 * 1024,
+    ) -> None:
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.max_fragments = max_fragments
+        self.max_size = max_size
+        self.pending: dict[tuple, _PartialMessage] = {}
+        self.last_wire_size = 0
+
+    def add(self, datagram: bytes, sender: object = None) -> bytes | None:
+        if len(datagram) < HEADER.size:
+            return None
+        magic, flags, msg_id, index, count = HEADER.unpack_from(datagram)
+        if magic != MAGIC or index >= count or count > self.max_fragments:
+            return None
+
+        chunk = datagram[HEADER.size :]
+        if count == 1:
+            self.last_wire_size = len(datagram)
+            return self.finish(chunk, flags)
+
+        key = (sender, msg_id)
+        partial = self.pending.get(key)
+        if partial is None:
+            self.expire()
+            partial = self.pending[key] = _PartialMessage(count, flags)
+
+        if partial.fragments[index] is None:
+            partial.fragments[index] = chunk
+            partial.missing -= 1
+            partial.wire_size += len(datagram)
+        if partial.missing:
+            return None
+
+        del self.pending[key]
+        self.last_wire_size = partial.wire_size
+        return self.finish(b"".join(partial.fragments), partial.flags)  # type: ignore
+
+    def finish(self, payload: bytes, flags: int) -> bytes | None:
+        if not flags & FLAG_COMPRESSED:
+            return payload if len(payload) <= self.max_size else None
+        try:
+            decompressor = zlib.decompressobj(zdict=ZDICT)
+            data = decompressor.decompress(payload, self.max_size)
+        except zlib.error:
+            return None
+        # Stopped at `max_size` with input left over, or cut short
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            return None
+        return data
+
+    def expire(self):
+        now = time.perf_counter()
+        for key, partial in list(self.pending.items()):
+            if now - partial.started > self.timeout:
+                del self.pending[key]
+
+        while len(self.pending) >= self.max_pending:
+            del self.pending[next(iter(self.pending))]
@@ -0,0 +1,174 @@
+import random
+
+import numpy as np
+import pygame
+
+from src import shared
+
+
+def make_glow_sprites(
+    colors: list[pygame.typing.ColorLike], n_frames: int = 4, radius: int = 3
+) -> list[list[pygame.Surface]]:
+    """
+    Soft dots for every colour, one frame per stage of a particle's life.
+    Frames go from freshly spawned to almost gone, shrinking and fading.
+    """
+
+    palettes = []
+    for color in colors:
+        color = pygame.Color(color)
+        frames = []
+        for frame in range(n_frames):
+            fade = 1 - frame / n_frames
+            r = max(1, round(radius * fade))
+            surf = pygame.Surface((r * 2, r * 2), pygame.SRCALPHA)
+            pygame.draw.circle(
+                surf, (color.r, color.g, color.b, round(255 * fade)), (r, r), r
+            )
+            frames.append(surf)
+        palettes.append(frames)
+    return palettes
+
+
+class ParticleSystem:
+    """
+    Particles stored as columns of NumPy arrays, moved and culled in
+    vectorized passes and drawn with one `fblits` call.
+
+    Live particles are always packed at the front of the arrays, so every
+    pass works on plain slices. Each particle has a colour index into
+    `sprites`, and the frame within that colour follows its remaining life.
+    """
+
+    def __init__(
+        self,
+        sprites: list[list[pygame.Surface]],
+        capacity: int = 16384,
+        gravity: tuple[float, float] = (0.0, 0.0),
+        drag: float = 0.0,
+        blend_flags: int = 0,
+    ) -> None:
+        self.capacity = capacity
+        self.gravity = np.array(gravity, np.float32)
+        self.drag = drag
+        self.blend_flags = blend_flags
+
+        self.n_frames = len(sprites[0])
+        # Flattened so a particle's sprite is `colour * n_frames + frame`
+        self.sprites = [frame for palette in sprites for frame in palette]
+        self.half_sizes = np.array(
+            [(s.get_width() / 2, s.get_height() / 2) for s in self.sprites],
+            np.float32,
+        )
+        # Furthest off screen a particle's top left can be and still show,
+        # in world units
+        self.cull_margin = float(self.half_sizes.max()) * 2
+
+        self.pos = np.zeros((capacity, 2), np.float32)
+        self.vel = np.zeros((capacity, 2), np.float32)
+        self.life = np.zeros(capacity, np.float32)
+        self.max_life = np.ones(capacity, np.float32)
+        self.color = np.zeros(capacity, np.int32)
+        self.count = 0
+
+        # Seeded from `random` so recorded games replay the same particles
+        self.rng = np.random.default_rng(random.getrandbits(64))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def emit(
+        self,
+        n: int,
+        area: tuple[float, float, float, float],
+        speed: tuple[float, float],
+        angle: tuple[float, float],
+        life: tuple[float, float],
+        colors: tuple[int, ...] = (0,),
+    ):
+        """
+        Spawns `n` particles at random points in `area` (x, y, w, h), heading
+        at a random `angle` in degrees and `speed` within the given ranges.
+        Particles that don't fit in `capacity` are dropped.
+        """
+
+        n = min(n, self.capacity - self.count)
+        if n <= 0:
+            return
+
+        rng = self.rng
+        new = slice(self.count, self.count + n)
+        x, y, w, h = area
+        self.pos[new, 0] = rng.uniform(x, x + w, n)
+        self.pos[new, 1] = rng.uniform(y, y + h, n)
+
+        radians = np.radians(rng.uniform(angle[0], angle[1], n))
+        speeds = rng.uniform(speed[0], speed[1], n)
+        self.vel[new, 0] = np.cos(radians) * speeds
+        self.vel[new, 1] = np.sin(radians) * speeds
+
+        self.max_life[new] = self.life[new] = rng.uniform(life[0], life[1], n)
+        self.color[new] = rng.choice(colors, n)
+        self.count += n
+
+    def update(self, dt: float):
+        n = self.count
+        if not n:
+            return
+
+        vel = self.vel[:n]
+        vel += self.gravity * dt
+        if self.drag:
+            vel *= max(0.0, 1 - self.drag * dt)
+        self.pos[:n] += vel * dt
+        self.life[:n] -= dt
+
+        alive = self.life[:n] > 0
+        n_alive = int(np.count_nonzero(alive))
+        if n_alive == n:
+            return
+
+        # Pack the survivors back at the front
+        for column in (self.pos, self.vel, self.life, self.max_life, self.color):
+            column[:n_alive] = column[:n][alive]
+        self.count = n_alive
+
+    def draw(self):
+        n = self.count
+        if not n:
+            return
+
+        frame = ((1 - self.life[:n] / self.max_life[:n]) * self.n_frames).astype(
+            np.int32
+        )
+        np.clip(frame, 0, self.n_frames - 1, out=frame)
+        sprite_index = self.color[:n] * self.n_frames + frame
+
+        camera = shared.camera
+        zoom = camera.zoom
+        screen_pos = (
+            self.pos[:n]
+            - (camera.offset.x, camera.offset.y)
+            - self.half_sizes[sprite_index]
+        ) * zoom
+        width, height = shared.srect.size
+        margin = self.cull_margin * zoom
+        visible = (
+            (screen_pos[:, 0] > -margin)
+            & (screen_pos[:, 0] < width)
+            & (screen_pos[:, 1] > -margin)
+            & (screen_pos[:, 1] < height)
+        )
+
+        # Scaled like everything else in the world, and cached by the camera
+        sprites = [camera.scale(sprite, zoom) for sprite in self.sprites]
+        shared.screen.fblits(
+            zip(
+                [sprites[i] for i in sprite_index[visible].tolist()],
+                screen_pos[visible].tolist(),
+            ),
+            self.blend_flags,
+        )
+
+    def clear(self):
+        self.count = 0
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+
+from .netstats import RollingHistogram
+
+
+@dataclass(frozen=True)
+class QualitySettings:
+    """What the game draws at one quality level"""
+
+    name: str
+    name_tags: bool
+    # Remote players are drawn rotated and flipped, rather than as is
+    outfit_detail: bool
+    # Multiplies how many particles effects emit
+    particle_scale: float
+    camera_smoothing: bool
+    lighting: bool
+
+
+# Lowest first
+QUALITY_LEVELS = (
+    QualitySettings("minimal", False, False, 0.0, False, False),
+    QualitySettings("low", True, False, 0.25, True, True),
+    QualitySettings("medium", True, True, 0.5, True, True),
+    QualitySettings("high", True, True, 1.0, True, True),
+)
+
+
+class QualityController:
+    """
+    Steps the quality level down when frames keep missing `budget` and back
+    up once they have had plenty of headroom.
+
+    Decisions look at the 95th percentile of the last `window` frame times,
+    worked out every `interval` frames rather than every frame. Stepping
+    down needs half a window of samples, stepping up needs a full window
+    under `upgrade_ratio` of the budget, and the samples start over
+    after every change. A level that was just left for being too slow is
+    therefore only tried again after a steady window, which keeps the
+    controller from flapping between two levels.
+    """
+
+    def __init__(
+        self,
+        budget: float = 1 / 60,
+        window: int = 90,
+        upgrade_ratio: float = 0.6,
+        interval: int = 15,
+    ) -> None:
+        self.budget = budget
+        self.window = window
+        self.upgrade_ratio = upgrade_ratio
+        self.interval = interval
+        # Frames left until the percentile is looked at again
+        self._frames_to_check = 0
+        self.level = len(QUALITY_LEVELS) - 1
+        self.is_enabled = True
+        self.frame_times = RollingHistogram(window)
+
+    @property
+    def settings(self) -> QualitySettings:
+        return QUALITY_LEVELS[self.level]
+
+    def update(self, frame_time: float):
+        """Takes how long the last frame's work took, in seconds"""
+
+        if not self.is_enabled:
+            return
+
+        self.frame_times.add(frame_time)
+        n_samples = len(self.frame_times.samples)
+        if n_samples < self.window // 2:
+            return
+        if self._frames_to_check > 0:
+            self._frames_to_check -= 1
+            return
+        self._frames_to_check = self.interval - 1
+
+        p95 = self.frame_times.summary()["p95"]
+        if p95 > self.budget and self.level > 0:
+            self.set_level(self.level - 1)
+        elif (
+            n_samples == self.window
+            and p95 < self.budget * self.upgrade_ratio
+            and self.level < len(QUALITY_LEVELS) - 1
+        ):
+            self.set_level(self.level + 1)
+
+    def set_level(self, level: int):
+        self.level = level
+        self.frame_times.samples.clear()
+        self._frames_to_check = 0
@@ -0,0 +1,92 @@
+import heapq
+import itertools
+import typing as t
+
+
+class ScheduledCall:
+    """Handle to a callback waiting in a `Scheduler`"""
+
+    __slots__ = ("time", "interval", "callback", "args", "is_cancelled")
+
+    def __init__(
+        self,
+        time: float,
+        interval: float | None,
+        callback: t.Callable[..., object],
+        args: tuple,
+    ) -> None:
+        self.time = time
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+
+class Scheduler:
+    """
+    Runs callbacks at points in simulation time, which only moves when
+    `update` is called with the frame's (or tick's) dt. Replays feed the
+    recorded dt, so timers fire on the same frames they did live.
+
+    Calls wait in a heap, so an update only costs anything for the calls
+    that are due. Cancelled calls are dropped lazily when they come up.
+    """
+
+    def __init__(self) -> None:
+        self.time = 0.0
+        self._queue: list[tuple[float, int, ScheduledCall]] = []
+        self._order = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(not call.is_cancelled for _, _, call in self._queue)
+
+    def call_later(
+        self, delay: float, callback: t.Callable[..., object], *args
+    ) -> ScheduledCall:
+        """Runs `callback(*args)` once, `delay` seconds from now"""
+
+        return self._push(ScheduledCall(self.time + delay, None, callback, args))
+
+    def call_every(
+        self,
+        interval: float,
+        callback: t.Callable[..., object],
+        *args,
+        first_delay: float | None = None,
+    ) -> ScheduledCall:
+        """
+        Runs `callback(*args)` every `interval` seconds until cancelled,
+        first after `first_delay` (one interval by default)
+        """
+
+        if interval <= 0:
+            raise ValueError("Repeating calls need a positive interval")
+        delay = interval if first_delay is None else first_delay
+        return self._push(ScheduledCall(self.time + delay, interval, callback, args))
+
+    def _push(self, call: ScheduledCall) -> ScheduledCall:
+        heapq.heappush(self._queue, (call.time, next(self._order), call))
+        return call
+
+    def update(self, dt: float):
+        """
+        Moves time forward by `dt` and runs everything that came due, in
+        order. A repeating call that fell behind runs once per missed interval.
+        """
+
+        self.time += dt
+        queue = self._queue
+        while queue and queue[0][0] <= self.time:
+            _, _, call = heapq.heappop(queue)
+            if call.is_cancelled:
+                continue
+            if call.interval is not None:
+                call.time += call.interval
+                self._push(call)
+            call.callback(*call.args)
+
+    def clear(self):
+        self._queue.clear()
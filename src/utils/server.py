@@ -1,59 +1,517 @@
+import math
 import socket
 import threading
+import time
+import typing as t
 
 import ujson
 
+from .lagcomp import PositionHistory
+from .mapsync import hash_map, pack_map_chunks
+from .netstats import NetStats, RollingHistogram
+from .packets import RECV_SIZE, PacketPacker, Reassembler, tune_socket
+from .spatial import SpatialGrid, ray_rect_distance
+
 
 class LocalBroadcastServer:
-    """Broadcast some data to devices connected on the same network"""
+    """Broadcast some data to devices connected on the same network
+
+    `get_broadcast_data` is called for every probe so the reply always
+    describes the live state of the server. The probe's id is echoed on a
+    line of its own before the JSON, so the body stays the same between
+    replies while the server doesn't change.
+    """
 
-    def __init__(self, discovery_port: int, broadcast_data: bytes) -> None:
+    def __init__(
+        self, discovery_port: int, get_broadcast_data: t.Callable[[], dict]
+    ) -> None:
         self.port = discovery_port
         self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server.bind(("0.0.0.0", self.port))
-        self.broadcast_data = broadcast_data
+        # Lets close() stop the listening thread before releasing the port
+        self.server.settimeout(0.25)
+        self.get_broadcast_data = get_broadcast_data
         self.is_broadcasting = False
+        self.thread: threading.Thread | None = None
 
     def start(self):
         self.is_broadcasting = True
-        threading.Thread(target=self.listen, daemon=True).start()
+        self.thread = threading.Thread(target=self.listen, daemon=True)
+        self.thread.start()
 
     def close(self):
         self.is_broadcasting = False
+        if self.thread is not None:
+            self.thread.join()
         self.server.close()
 
     def listen(self):
         while self.is_broadcasting:
-            message, addr = self.server.recvfrom(1024)
-            if message.decode() == "DISCOVER":
-                self.server.sendto(self.broadcast_data, addr)
+            try:
+                message, addr = self.server.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            parts = message.decode().split()
+            if not parts or parts[0] != "DISCOVER":
+                continue
+
+            reply = ujson.dumps(self.get_broadcast_data()).encode()
+            if len(parts) > 1:
+                reply = parts[1].encode() + b"\n" + reply
+            self.server.sendto(reply, addr)
+
+
+class Session:
+    """A client that has joined the server"""
+
+    def __init__(self, session_id: int, addr, history_size: int = 64) -> None:
+        self.id = session_id
+        self.addr = addr
+        self.state: dict | None = None
+        self.last_send_time: float | None = None
+        self.last_heard = time.perf_counter()
+        # Where the client was, by the time its states arrived
+        self.history = PositionHistory(history_size)
+
+    def record_position(self, received_at: float):
+        pos = self.state["pos"]
+        width, height = self.state.get("size", (0, 0))
+        self.history.add(received_at, (pos[0], pos[1], width, height))
 
 
 class UDPServer:
-    """Listens for incoming clients and broadcasts received data to other clients"""
+    """
+    Listens for incoming clients and broadcasts received data to other clients.
+
+    Clients join to get a session, and sessions that go quiet for
+    `session_timeout` seconds are evicted. Snapshots go out at
+    `target_tick_rate`.
+
+    Each client is only sent the peers inside `interest_size` (its view)
+    grown by `interest_margin` on every side. Peers outside of it are sent
+    every `far_update_interval` broadcasts.
+
+    Hits clients claim are checked against where the targets were in the
+    snapshot the shooter was looking at, going back at most `max_rewind`
+    seconds, and confirmed to the shooter and the target.
+
+    The server holds the map clients should play on. Its hash comes with
+    the welcome, and clients that don't have it ask for its chunks.
+
+    Given `sock`, the server sends through that socket instead of binding
+    its own, and leaves receiving to whoever feeds it `on_datagram` and
+    calls `tick_if_due`, like the dedicated server's lobby workers.
+    """
+
+    # Larger client states are dropped so one peer can't bloat every snapshot
+    MAX_STATE_SIZE = 4096
+    # Nothing a client sends is larger than a state
+    MAX_MESSAGE_FRAGMENTS = 8
+    # Send times of this many recent snapshots are kept for rewinding
+    SNAPSHOT_HISTORY = 256
+    MAX_HITSCAN_RANGE = 3000.0
+    # Chunks sent per map request at most
+    MAX_MAP_CHUNKS_PER_REQUEST = 64
+
+    def __init__(
+        self,
+        port: int,
+        capacity: int = 16,
+        stats_log_path: str | None = None,
+        packer: PacketPacker | None = None,
+        interest_size: tuple[float, float] = (1100, 650),
+        interest_margin: float = 200,
+        far_update_interval: int = 15,
+        target_tick_rate: float = 60,
+        session_timeout: float = 5.0,
+        max_rewind: float = 0.3,
+        hit_tolerance: float = 64,
+        map_data: bytes | None = None,
+        sock: socket.socket | None = None,
+    ):
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            tune_socket(sock)
+            sock.bind((socket.gethostbyname(socket.gethostname()), port))
+        self.socket = sock
+        self.packer = PacketPacker() if packer is None else packer
+        self.reassembler = Reassembler(
+            max_fragments=UDPServer.MAX_MESSAGE_FRAGMENTS,
+            max_size=UDPServer.MAX_STATE_SIZE,
+        )
+        self.sessions: dict[tuple, Session] = {}
+        self.capacity = capacity
+        self.session_timeout = session_timeout
+        self.stats = NetStats("server", log_path=stats_log_path)
+        self._seq = 0
+        self._next_session_id = 0
+
+        self.interest_size = interest_size
+        self.interest_margin = interest_margin
+        self.far_update_interval = far_update_interval
+        self.grid = SpatialGrid(max(interest_size) + 2 * interest_margin)
+
+        self.max_rewind = max_rewind
+        # How far a hit may start from where the server last saw the shooter
+        self.hit_tolerance = hit_tolerance
+        # (seq, send time) of recent snapshots, indexed by seq
+        self._snapshot_times: list[tuple[int, float]] = [
+            (-1, 0.0)
+        ] * UDPServer.SNAPSHOT_HISTORY
+        self.set_map(map_data)
 
-    def __init__(self, port: int):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.clients = set()
-        self.socket.bind((socket.gethostbyname(socket.gethostname()), port))
         self.is_listening = False
+        self.thread: threading.Thread | None = None
+
+        self.tick_time = 1 / target_tick_rate
+        self._next_tick = time.perf_counter()
+        # How long each tick's eviction and broadcast took
+        self.tick_duration = RollingHistogram()
+        # Broadcasts per second, measured over roughly one second windows
+        self.tick_rate = 0.0
+        self._ticks = 0
+        self._tick_window_start = time.perf_counter()
+
+    def set_map(self, data: bytes | None):
+        self.map_hash = None if data is None else hash_map(data)
+        self.map_chunks = [] if data is None else pack_map_chunks(data)
 
     def start(self):
         self.is_listening = True
-        threading.Thread(target=self.echo_listen, daemon=True).start()
+        self.thread = threading.Thread(target=self.echo_listen, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Stops the listening thread and frees the port before returning"""
+
+        self.is_listening = False
+        if self.thread is not None:
+            self.thread.join()
+        self.socket.close()
 
     def echo_listen(self):
-        all_clients_data = {}
         while self.is_listening:
-            data, addr = self.socket.recvfrom(1024)
-            self.clients.add(addr)
-            all_clients_data[addr] = ujson.loads(data.decode())
-
-            if len(all_clients_data) == len(self.clients):
-                for client in self.clients:
-                    data = all_clients_data.copy()
-                    data.pop(client)
-                    self.socket.sendto(
-                        ujson.dumps(list(data.values())).encode(), client
-                    )
+            self.socket.settimeout(max(0.001, self._next_tick - time.perf_counter()))
+            try:
+                datagram, addr = self.socket.recvfrom(RECV_SIZE)
+            except socket.timeout:
+                datagram = None
+            except OSError:
+                if not self.is_listening:
+                    break
+                datagram = None
+
+            if not self.is_listening:
+                break
+            if datagram is not None:
+                self.on_datagram(datagram, addr)
+            self.tick_if_due()
+
+    def tick_if_due(self) -> float:
+        """Evicts and broadcasts if it's time to, and returns when to next"""
+
+        now = time.perf_counter()
+        if now >= self._next_tick:
+            self._next_tick = max(self._next_tick + self.tick_time, now)
+            self.evict_idle_sessions()
+            self.broadcast()
+            self.tick_duration.add(time.perf_counter() - now)
+        return self._next_tick
+
+    def get_load(self) -> dict:
+        tick = self.tick_duration.summary()
+        stats = self.stats.snapshot()
+        return {
+            "players": len(self.sessions),
+            "capacity": self.capacity,
+            "tick_rate": self.tick_rate,
+            "tick_p50": tick.get("p50"),
+            "tick_p95": tick.get("p95"),
+            "bytes_in_per_sec": stats["bytes_in_per_sec"],
+            "bytes_out_per_sec": stats["bytes_out_per_sec"],
+        }
+
+    def on_datagram(self, datagram: bytes, addr):
+        data = self.reassembler.add(datagram, addr)
+        if data is None or len(data) > UDPServer.MAX_STATE_SIZE:
+            return
+
+        start = time.perf_counter()
+        try:
+            message = ujson.loads(data.decode())
+        except ValueError:
+            return
+        self.stats.deserialize_time.add(time.perf_counter() - start)
+
+        session = self.sessions.get(addr)
+        seq = message.pop("seq", None)
+        if session is None:
+            # Sequence numbers only mean something within a session
+            self.stats.on_receive(self.reassembler.last_wire_size)
+        else:
+            self.stats.on_receive(
+                self.reassembler.last_wire_size, peer=session.id, seq=seq
+            )
+
+        message_type = message.pop("type", None)
+        if message_type == "join":
+            self.on_join(addr)
+            return
+
+        if session is None:
+            self.send_message({"type": "kicked"}, addr)
+            return
+        session.last_heard = time.perf_counter()
+
+        if message_type == "state":
+            session.last_send_time = message.pop("t", None)
+            message["id"] = session.id
+            session.state = message
+            if "pos" in message:
+                self.grid.insert(session.id, *message["pos"])
+                session.record_position(session.last_heard)
+        elif message_type == "hit":
+            self.on_hit(session, message)
+        elif message_type == "map_request":
+            self.on_map_request(session, message)
+        elif message_type == "leave":
+            self.end_session(session)
+
+    def on_join(self, addr):
+        session = self.sessions.get(addr)
+        if session is None:
+            if len(self.sessions) >= self.capacity:
+                self.send_message({"type": "full"}, addr)
+                return
+            session = Session(self._next_session_id, addr)
+            self._next_session_id += 1
+            self.sessions[addr] = session
+
+        session.last_heard = time.perf_counter()
+        welcome = {"type": "welcome", "id": session.id}
+        if self.map_hash is not None:
+            welcome["map"] = self.map_hash
+            welcome["map_chunks"] = len(self.map_chunks)
+        self.send_message(welcome, addr)
+
+    def on_map_request(self, session: Session, message: dict):
+        # Asked for an older map, from before the host changed it
+        if message.get("map") != self.map_hash:
+            return
+
+        chunks = message.get("chunks")
+        if not isinstance(chunks, list):
+            return
+        for index in chunks[: UDPServer.MAX_MAP_CHUNKS_PER_REQUEST]:
+            if isinstance(index, int) and 0 <= index < len(self.map_chunks):
+                self.send_message(
+                    {
+                        "type": "map_chunk",
+                        "map": self.map_hash,
+                        "index": index,
+                        "data": self.map_chunks[index],
+                    },
+                    session.addr,
+                )
+
+    def get_view_time(self, view_seq) -> float:
+        """
+        When the snapshot a client was looking at went out, but no further
+        back than `max_rewind`
+        """
+
+        now = time.perf_counter()
+        earliest = now - self.max_rewind
+        if not isinstance(view_seq, int):
+            return earliest
+
+        seq, sent_at = self._snapshot_times[view_seq % UDPServer.SNAPSHOT_HISTORY]
+        if seq != view_seq:
+            return earliest
+        return min(now, max(sent_at, earliest))
+
+    def is_near_shooter(self, shooter: Session, x: float, y: float) -> bool:
+        rect = shooter.history.latest()
+        if rect is None:
+            return False
+        sx, sy, sw, sh = rect
+        tolerance = self.hit_tolerance
+        return (
+            sx - tolerance <= x <= sx + sw + tolerance
+            and sy - tolerance <= y <= sy + sh + tolerance
+        )
+
+    def on_hit(self, shooter: Session, message: dict):
+        """
+        Validates a hitscan (`origin`, `direction`, `range`) or melee (`area`)
+        hit against the rewound positions of every other client
+        """
+
+        view_time = self.get_view_time(message.get("view_seq"))
+        targets = [
+            session
+            for session in self.sessions.values()
+            if session is not shooter and session.history
+        ]
+
+        try:
+            if "area" in message:
+                hits = self.get_melee_hits(shooter, message["area"], targets, view_time)
+            else:
+                hits = self.get_hitscan_hits(shooter, message, targets, view_time)
+        except (KeyError, TypeError, ValueError):
+            return
+
+        for target, distance, point in hits:
+            confirmation = {
+                "type": "hit",
+                "shooter": shooter.id,
+                "target": target.id,
+                "distance": distance,
+                "point": point,
+            }
+            self.send_message(confirmation, shooter.addr)
+            self.send_message(confirmation, target.addr)
+
+    def get_hitscan_hits(
+        self, shooter: Session, message: dict, targets: list[Session], view_time
+    ) -> list[tuple[Session, float, list[float]]]:
+        """The nearest target the shot passes through, if any"""
+
+        ox, oy = (float(n) for n in message["origin"])
+        dx, dy = (float(n) for n in message["direction"])
+        max_distance = min(
+            float(message.get("range", UDPServer.MAX_HITSCAN_RANGE)),
+            UDPServer.MAX_HITSCAN_RANGE,
+        )
+        length = math.hypot(dx, dy)
+        if length == 0 or not self.is_near_shooter(shooter, ox, oy):
+            return []
+        dx, dy = dx / length, dy / length
+
+        nearest = None
+        for target in targets:
+            hit = ray_rect_distance(ox, oy, dx, dy, target.history.rewind(view_time))
+            if hit is None or hit[0] > max_distance:
+                continue
+            if nearest is None or hit[0] < nearest[1]:
+                nearest = (target, hit[0])
+
+        if nearest is None:
+            return []
+        target, distance = nearest
+        return [(target, distance, [ox + dx * distance, oy + dy * distance])]
+
+    def get_melee_hits(
+        self, shooter: Session, area, targets: list[Session], view_time
+    ) -> list[tuple[Session, float, list[float]]]:
+        """
+        Every target overlapping `area`. The area has to be centred on the
+        shooter and be no larger than `hit_tolerance` from it on any side.
+        """
+
+        x, y, w, h = (float(n) for n in area)
+        max_size = 2 * self.hit_tolerance
+        if not 0 <= w <= max_size or not 0 <= h <= max_size:
+            return []
+        if not self.is_near_shooter(shooter, x + w / 2, y + h / 2):
+            return []
+
+        hits = []
+        for target in targets:
+            tx, ty, tw, th = target.history.rewind(view_time)  # type: ignore
+            if tx <= x + w and x <= tx + tw and ty <= y + h and y <= ty + th:
+                distance = math.hypot(
+                    tx + tw / 2 - (x + w / 2), ty + th / 2 - (y + h / 2)
+                )
+                hits.append((target, distance, [tx + tw / 2, ty + th / 2]))
+        return hits
+
+    def end_session(self, session: Session):
+        del self.sessions[session.addr]
+        self.grid.remove(session.id)
+        self.stats.forget_peer(session.id)
+
+    def evict_idle_sessions(self):
+        now = time.perf_counter()
+        for session in list(self.sessions.values()):
+            if now - session.last_heard > self.session_timeout:
+                self.end_session(session)
+
+    def get_interested_peers(
+        self, session: Session, active: list[Session]
+    ) -> list[Session]:
+        """Returns the peers `session` should hear about this tick"""
+
+        # Staggered so far updates for different clients land on different ticks
+        pos = None if session.state is None else session.state.get("pos")
+        if pos is None or (self._seq + session.id) % self.far_update_interval == 0:
+            return [peer for peer in active if peer is not session]
+
+        width, height = self.interest_size
+        margin = self.interest_margin
+        nearby = self.grid.query(
+            pos[0] - width / 2 - margin,
+            pos[1] - height / 2 - margin,
+            width + 2 * margin,
+            height + 2 * margin,
+        )
+        return [
+            peer
+            for peer in active
+            if peer is not session and (peer.id in nearby or peer.id not in self.grid)
+        ]
+
+    def broadcast(self):
+        active = [
+            session for session in self.sessions.values() if session.state is not None
+        ]
+        if not active:
+            return
+
+        self._seq += 1
+        self._snapshot_times[self._seq % UDPServer.SNAPSHOT_HISTORY] = (
+            self._seq,
+            time.perf_counter(),
+        )
+        for session in self.sessions.values():
+            peers = self.get_interested_peers(session, active)
+
+            start = time.perf_counter()
+            packet = ujson.dumps(
+                {
+                    "type": "snapshot",
+                    "seq": self._seq,
+                    "echo": session.last_send_time,
+                    "clients": [peer.state for peer in peers],
+                }
+            ).encode()
+            self.stats.serialize_time.add(time.perf_counter() - start)
+
+            self.send(packet, session.addr)
+        self.count_tick()
+
+    def send(self, data: bytes, addr):
+        n_bytes = 0
+        try:
+            for datagram in self.packer.pack(data):
+                self.socket.sendto(datagram, addr)
+                n_bytes += len(datagram)
+        except OSError:
+            # Closed underneath us, or the peer is unreachable
+            return
+        self.stats.on_send(n_bytes)
+
+    def send_message(self, message: dict, addr):
+        self.send(ujson.dumps(message).encode(), addr)
+
+    def count_tick(self):
+        self._ticks += 1
+        elapsed = time.perf_counter() - self._tick_window_start
+        if elapsed >= 1.0:
+            self.tick_rate = self._ticks / elapsed
+            self._ticks = 0
+            self._tick_window_start = time.perf_counter()
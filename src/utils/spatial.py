@@ -0,0 +1,231 @@
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+
+
+@dataclass
+class RayHit:
+    """
+    Where a ray or segment first touches `target`, `distance` along it.
+    `normal` is the side of the rect that was hit, `(0, 0)` when the ray
+    starts inside it.
+    """
+
+    target: object
+    distance: float
+    point: tuple[float, float]
+    normal: tuple[float, float]
+
+
+def ray_rect_distance(
+    ox: float,
+    oy: float,
+    dx: float,
+    dy: float,
+    rect: tuple[float, float, float, float],
+) -> tuple[float, float, float] | None:
+    """
+    Slab test of the ray from `(ox, oy)` along the unit vector `(dx, dy)`.
+    Returns `(distance, normal_x, normal_y)` for the entry point, or None.
+    """
+
+    x, y, w, h = rect
+    t_near, t_far = -math.inf, math.inf
+    nx = ny = 0.0
+
+    if dx == 0:
+        if not x <= ox <= x + w:
+            return None
+    else:
+        t1, t2 = (x - ox) / dx, (x + w - ox) / dx
+        if t1 > t2:
+            t1, t2 = t2, t1
+        t_near, t_far = t1, t2
+        nx = -1.0 if dx > 0 else 1.0
+
+    if dy == 0:
+        if not y <= oy <= y + h:
+            return None
+    else:
+        t1, t2 = (y - oy) / dy, (y + h - oy) / dy
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > t_near:
+            t_near = t1
+            nx, ny = 0.0, (-1.0 if dy > 0 else 1.0)
+        t_far = min(t_far, t2)
+
+    if t_near > t_far or t_far < 0:
+        return None
+    if t_near < 0:
+        # Started inside the rect
+        return 0.0, 0.0, 0.0
+    return t_near, nx, ny
+
+
+class SpatialGrid:
+    """Buckets keys by the grid cells their rects touch, for fast area lookups"""
+
+    def __init__(self, cell_size: float) -> None:
+        self.cell_size = cell_size
+        self.cells: defaultdict[tuple[int, int], set] = defaultdict(set)
+        self.rects: dict[object, tuple[float, float, float, float]] = {}
+        self._key_cells: dict[object, tuple[int, int, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def __contains__(self, key) -> bool:
+        return key in self.rects
+
+    def get_cell_range(self, x, y, w, h) -> tuple[int, int, int, int]:
+        size = self.cell_size
+        return (
+            int(x // size),
+            int(y // size),
+            int((x + w) // size),
+            int((y + h) // size),
+        )
+
+    def insert(self, key, x: float, y: float, w: float = 0, h: float = 0):
+        """Adds `key` or moves it if it is already in the grid"""
+
+        cell_range = self.get_cell_range(x, y, w, h)
+        self.rects[key] = (x, y, w, h)
+        old_range = self._key_cells.get(key)
+        if old_range == cell_range:
+            return
+
+        if old_range is not None:
+            self._remove_from_cells(key, old_range)
+        self._key_cells[key] = cell_range
+        left, top, right, bottom = cell_range
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                self.cells[(cx, cy)].add(key)
+
+    def remove(self, key):
+        cell_range = self._key_cells.pop(key, None)
+        if cell_range is None:
+            return
+        del self.rects[key]
+        self._remove_from_cells(key, cell_range)
+
+    def _remove_from_cells(self, key, cell_range: tuple[int, int, int, int]):
+        left, top, right, bottom = cell_range
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    continue
+                cell.discard(key)
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def clear(self):
+        self.cells.clear()
+        self.rects.clear()
+        self._key_cells.clear()
+
+    def query(self, x: float, y: float, w: float, h: float) -> set:
+        """Returns the keys whose rects overlap the given rect"""
+
+        found = set()
+        left, top, right, bottom = self.get_cell_range(x, y, w, h)
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is not None:
+                    found |= cell
+
+        return {key for key in found if self._overlaps(self.rects[key], x, y, w, h)}
+
+    def raycast(
+        self,
+        ox: float,
+        oy: float,
+        dx: float,
+        dy: float,
+        max_distance: float,
+        ignore: set | frozenset = frozenset(),
+        first_only: bool = False,
+    ) -> list[RayHit]:
+        """
+        Walks the cells the ray crosses in order (DDA) and returns its hits
+        within `max_distance`, nearest first. With `first_only` the walk
+        stops as soon as no later cell can hold a nearer hit.
+        """
+
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return []
+        dx, dy = dx / length, dy / length
+
+        size = self.cell_size
+        cx, cy = int(ox // size), int(oy // size)
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # Distance along the ray to the next vertical / horizontal cell border
+        if dx > 0:
+            t_max_x = ((cx + 1) * size - ox) / dx
+        elif dx < 0:
+            t_max_x = (cx * size - ox) / dx
+        else:
+            t_max_x = math.inf
+        if dy > 0:
+            t_max_y = ((cy + 1) * size - oy) / dy
+        elif dy < 0:
+            t_max_y = (cy * size - oy) / dy
+        else:
+            t_max_y = math.inf
+        t_delta_x = size / abs(dx) if dx else math.inf
+        t_delta_y = size / abs(dy) if dy else math.inf
+
+        hits: list[RayHit] = []
+        nearest = math.inf
+        tested = set()
+        t = 0.0
+        while t <= max_distance:
+            cell = self.cells.get((cx, cy))
+            if cell is not None:
+                for key in cell:
+                    if key in tested or key in ignore:
+                        continue
+                    tested.add(key)
+                    hit = ray_rect_distance(ox, oy, dx, dy, self.rects[key])
+                    if hit is None or hit[0] > max_distance:
+                        continue
+                    distance, nx, ny = hit
+                    hits.append(
+                        RayHit(
+                            key,
+                            distance,
+                            (ox + dx * distance, oy + dy * distance),
+                            (nx, ny),
+                        )
+                    )
+                    nearest = min(nearest, distance)
+
+            # Every hit in a later cell is at least as far as this cell's exit
+            t_exit = min(t_max_x, t_max_y)
+            if first_only and nearest <= t_exit:
+                break
+
+            if t_max_x < t_max_y:
+                cx += step_x
+                t = t_max_x
+                t_max_x += t_delta_x
+            else:
+                cy += step_y
+                t = t_max_y
+                t_max_y += t_delta_y
+
+        hits.sort(key=lambda hit: hit.distance)
+        if first_only:
+            return hits[:1]
+        return hits
+
+    @staticmethod
+    def _overlaps(rect, x, y, w, h) -> bool:
+        rx, ry, rw, rh = rect
+        return rx <= x + w and x <= rx + rw and ry <= y + h and y <= ry + rh